@@ -13,4 +13,4 @@ class RestartStackIde(sublime_plugin.ApplicationCommand):
     as "SublimeStackIDE: Restart"
     """
     def run(self):
-        StackIDEManager.reset()
+        StackIDEManager.restart()
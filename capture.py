@@ -0,0 +1,205 @@
+try:
+    import sublime
+except ImportError:
+    from test.stubs import sublime
+
+import os
+import json
+import hashlib
+import itertools
+import threading
+import time
+from collections import defaultdict, deque
+
+from log import Log
+from metrics import ResponseTiming
+
+SENT = ">"
+RECEIVED = "<"
+
+# Sessions whose captures are kept per project
+max_sessions = 5
+
+_sessions = itertools.count(1)
+
+
+def capture_file(project_path):
+    """
+    A new capture file for a session on the project. Each session gets its own,
+    as monotonic times only make sense within one process, and a standby
+    instance runs alongside the one it replaces. The oldest are removed so only
+    the latest max_sessions are kept.
+    """
+    name = hashlib.sha1(project_path.encode('UTF-8')).hexdigest()[:12]
+    project_name = os.path.basename(project_path.rstrip(os.sep))
+    prefix = os.path.join(sublime.cache_path(), 'SublimeStackIDE', 'captures', project_name + '-' + name + '-')
+    prune_captures(prefix, max_sessions - 1)
+    session = "{}-{}-{}".format(time.strftime('%Y%m%d-%H%M%S'), os.getpid(), next(_sessions))
+    return prefix + session + '.log'
+
+
+def prune_captures(prefix, keep):
+    """
+    Removes all but the newest keep capture files starting with prefix, with their backups
+    """
+    (directory, start) = os.path.split(prefix)
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    captures = sorted((os.path.join(directory, name) for name in names
+                       if name.startswith(start) and name.endswith('.log')), key=os.path.getmtime)
+    for path in captures[:max(0, len(captures) - keep)]:
+        for name in names:
+            if os.path.join(directory, name).startswith(path):
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+
+
+class CaptureWriter:
+    """
+    Appends the JSON exchanged with stack-ide to a file, one message per line:
+
+        <time.monotonic()> <direction> <json>
+
+    where direction is ">" for requests and "<" for responses. Once the file
+    reaches max_bytes it is renamed to <path>.1 (shifting older ones along,
+    up to <path>.<backups>) and a new one started, so a capture never takes
+    more than (backups + 1) * max_bytes.
+    """
+
+    max_bytes = 16 * 1024 * 1024
+    backups = 2
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self._size = 0
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._open()
+        except OSError as e:
+            Log.warning("Couldn't capture stack-ide traffic: ", e)
+
+    def _open(self):
+        self._file = open(self.path, 'ab')
+        self._size = self._file.tell()
+
+    def record(self, direction, line, at=None):
+        """
+        Appends an already encoded message, stamped with the given
+        monotonic time or the current one
+        """
+        entry = "{:.6f} {} {}\n".format(time.monotonic() if at is None else at, direction, line).encode('UTF-8')
+        with self._lock:
+            if self._file is None:
+                return
+            try:
+                if self._size and self._size + len(entry) > self.max_bytes:
+                    self._rotate()
+                self._file.write(entry)
+                self._size += len(entry)
+            except OSError as e:
+                Log.warning("Stopped capturing stack-ide traffic: ", e)
+                self._close()
+
+    def _rotate(self):
+        self._file.close()
+        for n in range(self.backups, 0, -1):
+            source = self.path + ('.' + str(n - 1) if n > 1 else '')
+            if os.path.exists(source):
+                os.replace(source, self.path + '.' + str(n))
+        if not self.backups:
+            os.remove(self.path)
+        self._open()
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_capture(path):
+    """
+    Yields (time, direction, line) for each message in a capture file
+    """
+    with open(path, encoding='UTF-8') as f:
+        for entry in f:
+            parts = entry.rstrip('\n').split(' ', 2)
+            if len(parts) == 3:
+                yield (float(parts[0]), parts[1], parts[2])
+
+
+class ReplayBackend:
+    """
+    Stands in for JsonProcessBackend, feeding the responses from a capture
+    file to its handler (StackIDE.handle_response) with their original
+    spacing divided by speed, or as fast as possible if speed is 0.
+
+    Sequence ids in the capture belong to the recorded session. Responses
+    are matched to the requests sent to this backend by kind, in order, and
+    given their sequence ids, so their handlers run as they would have.
+    """
+
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = speed
+        self.handler = None
+        self._sent = defaultdict(deque) # Map from request tag to the seqs of requests sent to us
+        self._lock = threading.Lock()
+
+    def send_request(self, request):
+        with self._lock:
+            self._sent[request.get('tag')].append(request.get('seq'))
+        return True
+
+    def play(self, resend=None):
+        """
+        Replays the capture on the calling thread. If resend is given, it is
+        called with each recorded request as it comes up, and should send it
+        to this backend (through StackIDE.send_request, with a handler).
+        """
+        recorded_tags = {} # Map from recorded seq to the recorded request's tag
+        started = time.monotonic()
+        first_at = None
+        for (at, direction, line) in read_capture(self.path):
+            if first_at is None:
+                first_at = at
+            if self.speed:
+                delay = (at - first_at) / self.speed - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+
+            decode_started = time.monotonic()
+            try:
+                data = json.loads(line)
+            except ValueError:
+                Log.debug("Skipping unreadable capture entry: ", line)
+                continue
+            decode_time = time.monotonic() - decode_started
+
+            if direction == SENT:
+                recorded_tags[data.get('seq')] = data.get('tag')
+                if resend:
+                    resend(data)
+            elif direction == RECEIVED:
+                self._match(data, recorded_tags.pop(data.get('seq'), None))
+                self.handler(data, ResponseTiming(decode_started, decode_time))
+
+    def _match(self, data, tag):
+        with self._lock:
+            sent = self._sent.get(tag)
+            if sent:
+                data['seq'] = sent.popleft()
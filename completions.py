@@ -0,0 +1,82 @@
+from bisect import bisect_left
+from collections import OrderedDict
+
+
+def format_completion(completion):
+    return ["{}\t{}\t{}".format(completion.name,
+                                completion.type or '',
+                                completion.module or ''),
+             completion.name]
+
+
+class CompletionStore:
+    """
+    The Completions stack-ide returned for one query, sorted by name and
+    formatted for Sublime once, so that the completions for any longer
+    prefix are a slice of them.
+    """
+
+    def __init__(self, completions):
+        completions = sorted(completions, key=lambda completion: completion.name)
+        self.names = [completion.name for completion in completions]
+        self.formatted = [format_completion(completion) for completion in completions]
+
+    def __len__(self):
+        return len(self.names)
+
+    def matching(self, prefix):
+        """
+        Returns the formatted completions whose names start with the prefix.
+        """
+        if not prefix:
+            return self.formatted
+        start = bisect_left(self.names, prefix)
+        # Names starting with the prefix sort before the prefix with its last character bumped
+        end = bisect_left(self.names, prefix[:-1] + chr(ord(prefix[-1]) + 1), start)
+        return self.formatted[start:end]
+
+
+class CompletionCache:
+    """
+    Remembers the completions stack-ide returned for recent prefixes, so that
+    narrowing a prefix can be answered without asking stack-ide again.
+
+    Entries are keyed by (file, prefix, session generation). They are only
+    valid for one generation, i.e. until stack-ide finishes recompiling.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self.generation = None
+        self.entries = OrderedDict() # Map from (file, prefix, generation) to CompletionStore, least recently used first
+
+    def add(self, filepath, prefix, generation, store):
+        self._check_generation(generation)
+        key = (filepath, prefix, generation)
+        self.entries[key] = store
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def lookup(self, filepath, prefix, generation):
+        """
+        Returns the formatted completions for the prefix, if cached, or else narrows
+        down those of the longest cached prefix of it. Returns None if neither is known.
+        """
+        self._check_generation(generation)
+
+        # We can't tell how stack-ide matches qualified names, so only narrow plain ones.
+        # Neither do we narrow the empty prefix, which might not have been answered in full.
+        shortest = len(prefix) if '.' in prefix else min(1, len(prefix))
+        for length in range(len(prefix), shortest - 1, -1):
+            key = (filepath, prefix[:length], generation)
+            store = self.entries.get(key)
+            if store is not None:
+                self.entries.move_to_end(key)
+                return store.formatted if length == len(prefix) else store.matching(prefix)
+        return None
+
+    def _check_generation(self, generation):
+        if generation != self.generation:
+            self.entries.clear()
+            self.generation = generation
@@ -9,8 +9,43 @@ sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 from utility import is_haskell_view, relative_view_file_name, span_from_view_selection
 from req import Req
 from win import Win
-from stack_ide_manager import StackIDEManager, send_request
-from response import parse_autocompletions
+from stack_ide_manager import StackIDEManager, send_request, get_exp_types
+from response import parse_completions
+from completions import CompletionStore
+
+class StackIDEWindowListener(sublime_plugin.EventListener):
+    """
+    Starts and stops stack-ide instances as windows open and close.
+
+    on_new_window and on_pre_close_window only exist from Sublime Text 4.
+    On Sublime Text 3 we notice new windows when one of their views is
+    activated, and leave closed ones to the watchdog's sweep.
+    """
+    def on_new_window(self, window):
+        StackIDEManager.check_windows()
+
+    def on_pre_close_window(self, window):
+        StackIDEManager.close_window(window)
+
+    def on_activated(self, view):
+        window = view.window()
+        if window and not StackIDEManager.is_monitored(window):
+            StackIDEManager.check_windows()
+
+
+class StackIDEPrefetchListener(sublime_plugin.EventListener):
+    """
+    Prefetches the span info of the identifiers in a Haskell view when it
+    gains focus, if the prefetch_span_info setting is on.
+    """
+    def on_activated(self, view):
+        if not view.file_name() or not is_haskell_view(view):
+            return
+
+        window = view.window()
+        if StackIDEManager.is_running(window):
+            StackIDEManager.for_window(window).prefetch(view)
+
 
 class StackIDESaveListener(sublime_plugin.EventListener):
     """
@@ -31,23 +66,65 @@ class StackIDETypeAtCursorHandler(sublime_plugin.EventListener):
     """
     Ask stack-ide for the type at the cursor each
     time it changes position.
+
+    Requests are debounced: we only ask once the cursor has rested for
+    `type_at_cursor_delay` milliseconds, and the request in flight is
+    cancelled as soon as the cursor moves again.
     """
+    def __init__(self):
+        super(StackIDETypeAtCursorHandler, self).__init__()
+        self.selection_changes = {} # Map from view id to the number of the latest cursor move
+        self.requests = {} # Map from view id to the request in flight for it
+
     def on_selection_modified(self, view):
 
         if not is_haskell_view(view):
             return
 
+        # Only try to get types for views into files
+        # (rather than e.g. the find field or the console pane)
+        if not view.file_name():
+            return
+
+        change = self.selection_changes.get(view.id(), 0) + 1
+        self.selection_changes[view.id()] = change
+
+        # Whatever we asked for the previous position is no longer interesting
+        in_flight = self.requests.pop(view.id(), None)
+        if in_flight is not None:
+            in_flight.cancel()
+
+        sublime.set_timeout(lambda: self._request_type(view, change), self._delay())
+
+    def on_close(self, view):
+        self.selection_changes.pop(view.id(), None)
+        self.requests.pop(view.id(), None)
+
+    def _delay(self):
+        settings = StackIDEManager.settings
+        return settings.type_at_cursor_delay if settings else 0
+
+    def _request_type(self, view, change):
+        # The cursor moved again while we were waiting, a newer request is scheduled
+        if self.selection_changes.get(view.id()) != change:
+            return
+
         window = view.window()
         if not StackIDEManager.is_running(window):
             return
 
-        # Only try to get types for views into files
-        # (rather than e.g. the find field or the console pane)
-        if view.file_name():
-            # Uncomment to see the scope at the cursor:
-            # Log.debug(view.scope_name(view.sel()[0].begin()))
-            request = Req.get_exp_types(span_from_view_selection(view))
-            send_request(window, request, Win(window).highlight_type)
+        # Uncomment to see the scope at the cursor:
+        # Log.debug(view.scope_name(view.sel()[0].begin()))
+        span = span_from_view_selection(view)
+        pending = get_exp_types(window, span, lambda type_spans: self._handle_response(view, type_spans), view)
+        if pending is not None:
+            self.requests[view.id()] = pending
+
+    def _handle_response(self, view, type_spans):
+        self.requests.pop(view.id(), None)
+        window = view.window()
+        if window:
+            Win(window).highlight_type(type_spans)
 
 
 class StackIDEAutocompleteHandler(sublime_plugin.EventListener):
@@ -73,22 +150,27 @@ class StackIDEAutocompleteHandler(sublime_plugin.EventListener):
         # another request for completions.
         if not self.refreshing:
             self.view = view
-            request = Req.get_autocompletion(filepath=relative_view_file_name(view),prefix=prefix)
-            send_request(window, request, self._handle_response)
+            filepath = relative_view_file_name(view)
+            instance = StackIDEManager.for_window(window)
+            generation = instance.session_generation
+            cached = instance.completions.lookup(filepath, prefix, generation)
+            if cached is not None:
+                self.returned_completions = cached
+            else:
+                request = Req.get_autocompletion(filepath=filepath,prefix=prefix)
+                send_request(window, request,
+                    lambda response: self._handle_response(instance, filepath, prefix, generation, response), view)
 
         # Clear the flag to allow future completion queries
         self.refreshing = False
-        return list(self.format_completion(*completion) for completion in self.returned_completions)
-
+        return self.returned_completions
 
-    def format_completion(self, prop, scope):
-        return ["{}\t{}\t{}".format(prop.name,
-                                    prop.type or '',
-                                    scope.importedFrom.module if scope else ''),
-                 prop.name]
 
-    def _handle_response(self, response):
-        self.returned_completions = list(parse_autocompletions(response))
+    def _handle_response(self, instance, filepath, prefix, generation, response):
+        instance.index_completions(response)
+        store = CompletionStore(parse_completions(response, instance.names))
+        instance.completions.add(filepath, prefix, generation, store)
+        self.returned_completions = store.formatted
         self.view.run_command('hide_auto_complete')
         sublime.set_timeout(self.run_auto_complete, 0)
 
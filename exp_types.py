@@ -0,0 +1,126 @@
+from bisect import bisect_right, insort
+from collections import OrderedDict
+
+
+def span_key(span):
+    """
+    A hashable key for a request span, as made by span_from_view_selection
+    """
+    return (span.get('spanFilePath'), span.get('spanFromLine'), span.get('spanFromColumn'),
+            span.get('spanToLine'), span.get('spanToColumn'))
+
+
+class SpanIndex:
+    """
+    The expression spans of one file seen in ResponseGetExpTypes, which
+    nest like the expressions themselves, indexed to find the innermost one
+    around a position.
+
+    The innermost span of a response is a leaf of the expression tree when
+    it covers a single identifier, which the caller checks against the view.
+    Any position inside a leaf has the same enclosing expressions as that
+    response, so the response answers for it too. Other innermost spans,
+    e.g. for the cursor on a parenthesis, may enclose expressions we haven't
+    seen, so they are never leaves.
+    """
+
+    # Spans kept before starting afresh
+    max_spans = 4096
+
+    def __init__(self):
+        self.keys = [] # (start, negated end) of each span, so enclosing spans sort before those they enclose
+        self.leaves = {} # Map from (start, end) to the [(type, SourceSpan)] it is the leaf of, or None if it is not one
+
+    def add(self, type_spans, leaf=False):
+        """
+        Adds the spans of a response, innermost first. If leaf, the innermost
+        covers a single identifier.
+        """
+        if len(self.keys) + len(type_spans) > self.max_spans:
+            self.__init__()
+        for (i, (_type, span)) in enumerate(type_spans):
+            if span is None:
+                continue
+            start = (span.fromLine, span.fromColumn)
+            end = (span.toLine, span.toColumn)
+            if (start, end) not in self.leaves:
+                insort(self.keys, (start, (-end[0], -end[1])))
+                self.leaves[(start, end)] = type_spans if i == 0 and leaf else None
+            elif i > 0:
+                self.leaves[(start, end)] = None
+
+    def enclosing_leaf(self, start, end):
+        """
+        Returns the types of the leaf that is the innermost known span around
+        start to end, or None if there is no such leaf
+        """
+        # Spans starting at start or before, the innermost candidates last.
+        # (Negated ends are at most (-1, -1), so (1, 1) sorts after them all.)
+        keys = self.keys
+        for i in range(bisect_right(keys, (start, (1, 1))) - 1, -1, -1):
+            (span_start, (neg_line, neg_column)) = keys[i]
+            span_end = (-neg_line, -neg_column)
+            if span_end >= end:
+                return self.leaves[(span_start, span_end)]
+        return None
+
+
+class ExpTypesCache:
+    """
+    Remembers the expression types stack-ide returned for recent cursor spans,
+    as lists of (type, SourceSpan) pairs, so that asking again is answered locally.
+    Positions inside a leaf expression seen before are answered from its SpanIndex.
+
+    Entries are only valid for one session generation, i.e. until stack-ide
+    finishes recompiling, and are dropped for a file as soon as it is saved.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.generation = None
+        self.entries = OrderedDict() # Map from span key to [(type, SourceSpan)], least recently used first
+        self.indexes = {} # Map from file path to SpanIndex
+
+    def add(self, span, generation, type_spans, leaf=False):
+        """
+        Caches the types for the span. If leaf, their innermost span covers a
+        single identifier, see SpanIndex.
+        """
+        self._check_generation(generation)
+        key = span_key(span)
+        self.entries[key] = type_spans
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        if type_spans:
+            self.indexes.setdefault(key[0], SpanIndex()).add(type_spans, leaf)
+
+    def lookup(self, span, generation):
+        """
+        Returns the types cached for the span, or None
+        """
+        self._check_generation(generation)
+        key = span_key(span)
+        type_spans = self.entries.get(key)
+        if type_spans is not None:
+            self.entries.move_to_end(key)
+            return type_spans
+
+        (filepath, from_line, from_column, to_line, to_column) = key
+        index = self.indexes.get(filepath)
+        if index is not None:
+            return index.enclosing_leaf((from_line, from_column), (to_line, to_column))
+        return None
+
+    def forget_files(self, filepaths):
+        filepaths = set(filepaths)
+        for key in [key for key in self.entries if key[0] in filepaths]:
+            del self.entries[key]
+        for filepath in filepaths:
+            self.indexes.pop(filepath, None)
+
+    def _check_generation(self, generation):
+        if generation != self.generation:
+            self.entries.clear()
+            self.indexes.clear()
+            self.generation = generation
@@ -0,0 +1,96 @@
+import threading
+from collections import deque
+
+
+class RollingHistogram:
+    """
+    Keeps the latest samples of a measurement and reports percentiles over them
+    """
+
+    def __init__(self, size=500):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+
+    def percentiles(self, *ps):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return [None for p in ps]
+        return [ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in ps]
+
+
+class ResponseTiming:
+    """
+    When the first byte of a response was read, and how long it took to decode
+    """
+
+    def __init__(self, first_byte_at, decode_time):
+        self.first_byte_at = first_byte_at
+        self.decode_time = decode_time
+
+
+class Metrics:
+    """
+    Rolling timings, in seconds, of each phase of the requests sent to stack-ide,
+    keyed by request kind (the request tag without the "Request" prefix).
+
+    Phases, all measured from when the request was queued unless noted:
+      first byte  - its response started to arrive
+      decode      - time spent decoding the response JSON
+      response    - the decoded response reached StackIDE
+      prepare     - time spent preparing the response on the worker thread, if needed
+      main thread - time the (prepared) response then waited for the main thread
+      handler     - time the response handler ran
+      total       - the response handler finished
+    """
+
+    phases = ["first byte", "decode", "response", "prepare", "main thread", "handler", "total"]
+
+    histograms = {} # Map from (kind, phase) to RollingHistogram
+    lock = threading.Lock()
+
+    @classmethod
+    def record(cls, kind, phase, seconds):
+        with cls.lock:
+            histogram = cls.histograms.get((kind, phase))
+            if histogram is None:
+                histogram = cls.histograms[(kind, phase)] = RollingHistogram()
+            histogram.add(seconds)
+
+    @classmethod
+    def latest(cls, kind, phase):
+        with cls.lock:
+            histogram = cls.histograms.get((kind, phase))
+            return histogram.samples[-1] if histogram and histogram.samples else None
+
+    @classmethod
+    def reset(cls):
+        with cls.lock:
+            cls.histograms = {}
+
+    @classmethod
+    def report(cls):
+        """
+        Formats the p50/p95/p99 of every phase of every request kind, in milliseconds
+        """
+        lines = ["{:<22} {:<12} {:>7} {:>9} {:>9} {:>9}".format("request", "phase", "count", "p50 ms", "p95 ms", "p99 ms")]
+        with cls.lock:
+            kinds = sorted(set(kind for (kind, phase) in cls.histograms))
+            for kind in kinds:
+                for phase in cls.phases:
+                    histogram = cls.histograms.get((kind, phase))
+                    if histogram is None:
+                        continue
+                    lines.append("{:<22} {:<12} {:>7} {:>9.1f} {:>9.1f} {:>9.1f}".format(
+                        kind, phase, histogram.count,
+                        *(value * 1000 for value in histogram.percentiles(50, 95, 99))))
+        if not kinds:
+            lines.append("No requests timed yet.")
+        return "\n".join(lines)
+
+
+def request_kind(tag):
+    return tag[len("Request"):] if tag and tag.startswith("Request") else str(tag)
@@ -0,0 +1,212 @@
+try:
+    import sublime
+except ImportError:
+    from test.stubs import sublime
+
+import re
+import time
+from bisect import bisect_right
+from collections import deque
+
+from req import Req
+from response import parse_span_info_response
+from utility import relative_view_file_name, IDENTIFIER
+
+KEYWORDS = {"case", "class", "data", "default", "deriving", "do", "else", "foreign", "if", "import",
+            "in", "infix", "infixl", "infixr", "instance", "let", "module", "newtype", "of", "then",
+            "type", "where", "qualified", "as", "hiding"}
+
+
+# Scopes whose words aren't identifiers worth asking about
+SKIPPED_SCOPES = "string, comment"
+
+
+def identifier_positions(text, near_row=0, skipped=()):
+    """
+    Returns the 1-based (line, column) of each identifier in the text,
+    those on lines nearest to near_row (0-based) first. Keywords are
+    skipped, and so are identifiers inside the skipped Regions of the
+    text (in order), e.g. those of its strings and comments.
+    """
+    skipped_starts = [region.begin() for region in skipped]
+    lines = []
+    line_start = 0
+    for (row, line) in enumerate(text.split('\n')):
+        positions = []
+        for match in IDENTIFIER.finditer(line):
+            offset = line_start + match.start()
+            i = bisect_right(skipped_starts, offset)
+            if match.group() not in KEYWORDS and not (i and offset < skipped[i - 1].end()):
+                positions.append((row + 1, match.start() + 1))
+        if positions:
+            lines.append((abs(row - near_row), positions))
+        line_start += len(line) + 1
+    lines.sort(key=lambda line: line[0])
+    return [position for (_, positions) in lines for position in positions]
+
+
+class ModuleSymbols:
+    """
+    The span info known for identifiers in one module, by position.
+    Identifiers don't nest, so the one at a position is the last one
+    starting before it, if it hasn't ended yet.
+    """
+
+    def __init__(self, generation):
+        self.generation = generation
+        self.starts = [] # (line, column) each identifier starts at, in order
+        self.infos = [] # ((IdProp, IdScope), SourceSpan) for each of them
+
+    def add(self, info):
+        span = info[1]
+        start = (span.fromLine, span.fromColumn)
+        i = bisect_right(self.starts, start)
+        if i and self.starts[i - 1] == start:
+            self.infos[i - 1] = info
+        else:
+            self.starts.insert(i, start)
+            self.infos.insert(i, info)
+
+    def at(self, line, column):
+        i = bisect_right(self.starts, (line, column))
+        if i:
+            info = self.infos[i - 1]
+            span = info[1]
+            if (span.toLine, span.toColumn) >= (line, column):
+                return info
+        return None
+
+
+class SpanInfoTable:
+    """
+    Span info per module, for the current session generation, so that info
+    popups and go to definition can be answered without asking stack-ide.
+    """
+
+    def __init__(self):
+        self.modules = {} # Map from file path to ModuleSymbols
+
+    def add(self, filepath, generation, infos):
+        symbols = self.modules.get(filepath)
+        if symbols is None or symbols.generation != generation:
+            symbols = self.modules[filepath] = ModuleSymbols(generation)
+        for info in infos:
+            if info[1] is not None:
+                symbols.add(info)
+
+    def lookup(self, filepath, generation, line, column):
+        """
+        Returns the ((IdProp, IdScope), SourceSpan) of the identifier at the position, or None
+        """
+        symbols = self.modules.get(filepath)
+        if symbols is None or symbols.generation != generation:
+            return None
+        return symbols.at(line, column)
+
+    def forget_files(self, filepaths):
+        for filepath in filepaths:
+            self.modules.pop(filepath, None)
+
+
+class Prefetcher:
+    """
+    Asks stack-ide for the span info of every identifier in the view last
+    given focus, nearest the cursor first, filling its instance's
+    SpanInfoTable. Requests go one at a time, and only while no interactive
+    request is waiting for stack-ide, so they never hold up the user's.
+
+    The identifiers still to ask about are kept per file until the session
+    recompiles, so returning to a view carries on where it left off, and at
+    most max_requests are sent per session generation.
+    """
+
+    # Milliseconds between requests, and between checks while stack-ide is busy
+    interval = 20
+    busy_interval = 250
+
+    # Seconds after which an unanswered interactive request no longer holds prefetching up
+    busy_timeout = 5
+
+    # Most requests to send per session generation, over all views
+    max_requests = 2000
+
+    def __init__(self, instance):
+        self.instance = instance
+        self.generation = None
+        self.queues = {} # Map from file path to the (line, column) still to ask about, this generation
+        self.filepath = None # The file being prefetched for
+        self.requests = 0 # Sent this generation
+        self.scheduled = False
+        self.pending = None # The PendingRequest sent last
+        self.stopped = False
+
+    def prefetch(self, view):
+        """
+        Prefetches for the view from now on, instead of for the one before
+        """
+        generation = self.instance.session_generation
+        if generation != self.generation:
+            self.generation = generation
+            self.queues = {}
+            self.requests = 0
+        self.filepath = relative_view_file_name(view)
+        if self.filepath not in self.queues:
+            text = view.substr(sublime.Region(0, view.size()))
+            near_row = view.rowcol(view.sel()[0].begin())[0] if len(view.sel()) else 0
+            skipped = view.find_by_selector(SKIPPED_SCOPES)
+            self.queues[self.filepath] = deque(identifier_positions(text, near_row, skipped))
+
+        # Unless the chain of requests is still going
+        waiting = self.pending is not None and self.pending.seq_id in self.instance.conts
+        if not self.scheduled and not waiting:
+            self._schedule(self.interval)
+
+    def stop(self):
+        self.stopped = True
+
+    def _schedule(self, delay):
+        self.scheduled = True
+        sublime.set_timeout(self._next, delay)
+
+    def _next(self):
+        self.scheduled = False
+        instance = self.instance
+        queue = self.queues.get(self.filepath)
+        if (self.stopped or not queue or not instance.is_active
+                or instance.session_generation != self.generation or self.requests >= self.max_requests):
+            return
+        if self._busy():
+            self._schedule(self.busy_interval)
+            return
+
+        while queue:
+            (line, column) = queue.popleft()
+            if instance.span_infos.lookup(self.filepath, self.generation, line, column) is None:
+                break
+        else:
+            return
+
+        (filepath, generation) = (self.filepath, self.generation)
+        span = {"spanFilePath": filepath,
+                "spanFromLine": line, "spanFromColumn": column,
+                "spanToLine": line, "spanToColumn": column}
+        self.requests += 1
+        self.pending = instance.send_request(Req.get_exp_info(span),
+            lambda response: self._handle_response(filepath, generation, response))
+
+    def _busy(self):
+        """
+        Whether a request made for a view is waiting for its response.
+        Those long overdue are taken to be lost.
+        """
+        now = time.monotonic()
+        with self.instance.conts_lock:
+            return any(not pending.cancelled and now - pending.sent_at < self.busy_timeout
+                       for pending in self.instance.latest_requests.values())
+
+    def _handle_response(self, filepath, generation, response):
+        infos = list(parse_span_info_response(response, self.instance.names))
+        self.instance.span_infos.add(filepath, generation, infos)
+        self.instance.index_span_infos(infos)
+        if not self.scheduled:
+            self._schedule(self.interval)
@@ -13,12 +13,64 @@
 # ResponseUpdateSession
 # ResponseLog
 
-def parse_autocompletions(contents):
+class NameTable:
+    """
+    Hands out one shared copy of each module, package and type name, and of
+    each IdScope, so large responses don't keep thousands of equal copies.
+    Each StackIDE session has its own, passed to the parsers below.
+    """
+
+    # Entries kept before starting afresh, in case a session runs for long
+    max_size = 50000
+
+    def __init__(self):
+        self.names = {}
+        self.scopes = {} # Map from (module, package) to IdScope
+
+    def name(self, name):
+        interned = self.names.get(name)
+        if interned is None:
+            if name is None:
+                return None
+            if len(self.names) >= self.max_size:
+                self.names.clear()
+            interned = self.names[name] = name
+        return interned
+
+    def scope(self, module, package):
+        key = (module, package)
+        scope = self.scopes.get(key)
+        if scope is None:
+            if len(self.scopes) >= self.max_size:
+                self.scopes.clear()
+            scope = self.scopes[key] = IdScope(IdImportedFrom(self.name(module), self.name(package)))
+        return scope
+
+
+# For parsing outside of a session
+default_names = NameTable()
+
+
+def parse_autocompletions(contents, names=None):
     """
     Converts ResponseGetAutoCompletion content into [(IdProp, IdScope)]
     """
-    return ((parse_idprop(item.get('idProp')),
-            parse_idscope(item.get('idScope'))) for item in contents)
+    return ((parse_idprop(item.get('idProp'), names),
+            parse_idscope(item.get('idScope'), names)) for item in contents)
+
+
+def parse_completions(contents, names=None):
+    """
+    Converts ResponseGetAutoCompletion content into Completions, decoding
+    only what the completions list shows
+    """
+    names = names or default_names
+    for item in contents:
+        prop = item.get('idProp')
+        importedFrom = item.get('idScope').get('idImportedFrom')
+        yield Completion(prop.get('idName'),
+                         names.name(prop.get('idType')),
+                         names.name(importedFrom.get('moduleName')) if importedFrom else None)
 
 
 def parse_update_session(contents):
@@ -44,25 +96,26 @@ def parse_source_errors(contents):
                         parse_either_span(item.get('errorSpan'))) for item in contents)
 
 
-def parse_exp_types(contents):
+def parse_exp_types(contents, names=None):
     """
     Converts ResponseGetExpTypes contents into an array of pairs containing
     Text and SourceSpan
     Also see: type_info_for_sel (replace)
     """
-    return ((item[0], parse_source_span(item[1])) for item in contents)
+    names = names or default_names
+    return ((names.name(item[0]), parse_source_span(item[1])) for item in contents)
 
 
-def parse_span_info_response(contents):
+def parse_span_info_response(contents, names=None):
     """
     Converts ResponseGetSpanInfo contents into an array of pairs of SpanInfo and SourceSpan objects
     ResponseGetSpanInfo's contents are an array of SpanInfo and SourceSpan pairs
     """
-    return ((parse_span_info(responseSpanInfo[0]),
+    return ((parse_span_info(responseSpanInfo[0], names),
              parse_source_span(responseSpanInfo[1])) for responseSpanInfo in contents)
 
 
-def parse_span_info(json):
+def parse_span_info(json, names=None):
     """
     Converts SpanInfo contents into a pair of IdProp and IdScope objects
 
@@ -72,28 +125,33 @@ def parse_span_info(json):
     TODO: deal with SpanQQ here
     """
     contents = json.get('contents')
-    return (parse_idprop(contents.get('idProp')),
-            parse_idscope(contents.get('idScope')))
+    return (parse_idprop(contents.get('idProp'), names),
+            parse_idscope(contents.get('idScope'), names))
 
 
-def parse_idprop(values):
+def parse_idprop(values, names=None):
     """
     Converts idProp content into an IdProp object.
     """
-    return IdProp(values.get('idDefinedIn').get('moduleName'),
-                    values.get('idDefinedIn').get('modulePackage').get('packageName'),
-                    values.get('idType'),
+    names = names or default_names
+    definedIn = values.get('idDefinedIn')
+    return IdProp(names.name(definedIn.get('modulePackage').get('packageName')),
+                    names.name(definedIn.get('moduleName')),
+                    names.name(values.get('idType')),
                     values.get('idName'),
-                    parse_either_span(values.get('idDefSpan')))
+                    None,
+                    values.get('idDefSpan'))
 
 
-def parse_idscope(values):
+def parse_idscope(values, names=None):
     """
-    Converts idScope content into an IdScope object (containing only an IdImportedFrom)
+    Converts idScope content into an IdScope object (containing only an IdImportedFrom),
+    shared with every other scope for the same module
     """
+    names = names or default_names
     importedFrom = values.get('idImportedFrom')
-    return IdScope(IdImportedFrom(importedFrom.get('moduleName'),
-                                  importedFrom.get('modulePackage').get('packageName'))) if importedFrom else None
+    return names.scope(importedFrom.get('moduleName'),
+                       importedFrom.get('modulePackage').get('packageName')) if importedFrom else None
 
 
 def parse_either_span(json):
@@ -110,20 +168,18 @@ def parse_source_span(json):
     """
     Converts json into a SourceSpan
     """
-    paths = ['spanFilePath', 'spanFromLine', 'spanFromColumn', 'spanToLine', 'spanToColumn']
-    fields = get_paths(paths, json)
-    return SourceSpan(*fields) if fields else None
+    get = json.get
+    return SourceSpan(get('spanFilePath'), get('spanFromLine'), get('spanFromColumn'),
+                      get('spanToLine'), get('spanToColumn'))
 
 
-def get_paths(paths, values):
-    """
-    Converts a list of keypaths into an array of values from a dict
-    """
-    return list(values.get(path) for path in paths)
-
+# The classes below are created by the thousand for large responses,
+# so they use __slots__ rather than a __dict__ per instance.
 
 class SourceError():
 
+    __slots__ = ('kind', 'msg', 'span')
+
     def __init__(self, kind, message, span):
         self.kind = kind
         self.msg = message
@@ -143,6 +199,8 @@ class SourceError():
 
 class SourceSpan():
 
+    __slots__ = ('filePath', 'fromLine', 'fromColumn', 'toLine', 'toColumn')
+
     def __init__(self, filePath, fromLine, fromColumn, toLine, toColumn):
         self.filePath = filePath
         self.fromLine = fromLine
@@ -153,12 +211,16 @@ class SourceSpan():
 
 class IdScope():
 
+    __slots__ = ('importedFrom',)
+
     def __init__(self, importedFrom):
         self.importedFrom = importedFrom
 
 
 class IdImportedFrom():
 
+    __slots__ = ('module', 'package')
+
     def __init__(self, module, package):
         self.module = module
         self.package = package
@@ -166,9 +228,32 @@ class IdImportedFrom():
 
 class IdProp():
 
-    def __init__(self, package, module, type, name, defSpan):
+    __slots__ = ('package', 'module', 'type', 'name', '_defSpan', '_defSpanJson')
+
+    def __init__(self, package, module, type, name, defSpan, defSpanJson=None):
         self.package = package
         self.module = module
         self.type = type
         self.name = name
-        self.defSpan = defSpan
+        self._defSpan = defSpan
+        self._defSpanJson = defSpanJson # EitherSpan content, parsed into defSpan when first needed
+
+    @property
+    def defSpan(self):
+        if self._defSpanJson is not None:
+            self._defSpan = parse_either_span(self._defSpanJson)
+            self._defSpanJson = None
+        return self._defSpan
+
+
+class Completion():
+    """
+    An autocompletion item: just the name, type and imported-from module shown for it
+    """
+
+    __slots__ = ('name', 'type', 'module')
+
+    def __init__(self, name, type, module):
+        self.name = name
+        self.type = type
+        self.module = module
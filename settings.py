@@ -1,7 +1,11 @@
 class Settings:
 
-    def __init__(self, verbosity, add_to_PATH, show_popup, hoogle_url=None):
+    def __init__(self, verbosity, add_to_PATH, show_popup, hoogle_url=None, type_at_cursor_delay=100, show_latency=False, capture_traffic=False, prefetch_span_info=False):
         self.verbosity = verbosity
         self.add_to_PATH = add_to_PATH
         self.show_popup = show_popup
         self.hoogle_url = hoogle_url
+        self.type_at_cursor_delay = type_at_cursor_delay
+        self.show_latency = show_latency
+        self.capture_traffic = capture_traffic
+        self.prefetch_span_info = prefetch_span_info
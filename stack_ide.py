@@ -5,17 +5,29 @@ except ImportError:
 
 import subprocess, os
 import sys
+import glob
+import hashlib
 import threading
 import json
+import time
 import uuid
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
 
 sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 
-from utility import first_folder, complain
+from utility import first_folder, complain, is_haskell_view, is_identifier_span
 from req import Req
 from log import Log
-from win import Win
+from win import Win, ErrorReport
 import response as res
+from metrics import Metrics, ResponseTiming, request_kind
+from capture import CaptureWriter, capture_file, SENT, RECEIVED
+from exp_types import ExpTypesCache
+from prefetch import SpanInfoTable, Prefetcher
+from symbol_index import SymbolIndex
+from completions import CompletionCache
 
 # Make sure Popen hides the console on Windows.
 # We don't need this on other platforms
@@ -26,11 +38,31 @@ if os.name == 'nt':
 
 class StackIDE:
 
+    # Seconds after which we give up on a response ever arriving
+    request_ttl = 300
 
-    def __init__(self, window, settings, backend=None):
-        self.window = window
+    # Whether to show the latest round-trip time in the status bar
+    show_latency = False
+
+    # Whether instances started from now on record their traffic with stack-ide
+    capture_traffic = False
 
-        self.conts = {} # Map from uuid to response handler
+    # Whether to ask for the span info of every identifier in the active view
+    # in the background, once it has compiled
+    prefetch_span_info = False
+
+    def __init__(self, window, settings, backend=None, on_ready=None, standby=False):
+        self.window = window
+        self.on_ready = on_ready # Called with the instance once its first compile is done
+        # All windows sharing this instance, starting with the one it was created for.
+        # A standby has none, so shows nothing, until it takes over from the instance it replaces.
+        self.windows = [] if standby else [window]
+
+        self.conts = {} # Map from uuid to PendingRequest
+        self.conts_lock = threading.Lock() # Responses are matched to requests on the dispatch thread
+        self.latest_requests = {} # Map from (request tag, view id) to the newest PendingRequest
+        self.last_sweep = time.monotonic()
+        self.max_pending = 0 # Most requests ever waiting for a response at once
         self.is_alive  = True
         self.is_active = False
         self.process   = None
@@ -45,37 +77,125 @@ class StackIDE:
         else: # for testing
             self._backend = backend
             self._backend.handler = self.handle_response
+        self._backend.on_dropped = self._forget_unsent
 
         self.is_active = True
+        self.names = res.NameTable() # Shared names of this session's responses
         self.include_targets = set()
+        self.session_generation = 0 # Bumped each time stack-ide finishes (re)compiling
+        self.is_compiling = True
+        self.exp_types = ExpTypesCache()
+        self.span_infos = SpanInfoTable()
+        self.completions = CompletionCache() # By file and prefix, so per project
+        self.prefetcher = Prefetcher(self)
+        sublime.set_timeout_async(lambda: SymbolIndex.for_project(self.project_path), 0)
 
         # TODO: could check packages here to fix the 'project_dir must equal packagename issue'
 
         sublime.set_timeout_async(self.load_initial_targets, 0)
 
 
-    def send_request(self, request, response_handler = None):
+    def send_request(self, request, response_handler = None, view = None, prepare = None):
         """
         Associates requests with handlers and passes them on to the process.
+
+        If a view is given, the request supersedes any earlier request of the
+        same kind for that view, whose response will then be dropped.
+        If prepare is given, the response is passed through it on the worker
+        thread, and the handler gets the result on the main thread.
+        Returns a PendingRequest that can be cancelled, if a handler was given.
         """
+        pending = None
         if self._backend:
             if response_handler is not None:
                 seq_id = str(uuid.uuid4())
-                self.conts[seq_id] = response_handler
+                pending = PendingRequest(seq_id, request.get('tag'), response_handler, view.id() if view else None, prepare)
+                self._track(pending)
                 request = request.copy()
                 request['seq'] = seq_id
 
-            self._backend.send_request(request)
+            if self._backend.send_request(request) is False and pending is not None:
+                self._forget(pending)
+                pending = None
         else:
             Log.error("Couldn't send request, no process!", request)
+        return pending
+
+    def _track(self, pending):
+        """
+        Registers a pending request, superseding the previous one in its group
+        and forgetting requests whose responses are long overdue. A superseded
+        request still waiting to be written is not sent at all.
+        """
+        with self.conts_lock:
+            self.conts[pending.seq_id] = pending
+            self.max_pending = max(self.max_pending, len(self.conts))
+            if pending.group is not None:
+                superseded = self.latest_requests.get(pending.group)
+                if superseded is not None:
+                    superseded.cancel()
+                    discard = getattr(self._backend, 'discard', None)
+                    if discard is not None and discard(superseded.seq_id):
+                        del self.conts[superseded.seq_id]
+                self.latest_requests[pending.group] = pending
+
+        now = time.monotonic()
+        if now - self.last_sweep > self.request_ttl / 10:
+            self.last_sweep = now
+            self._sweep_expired(now)
+
+    def _forget(self, pending):
+        with self.conts_lock:
+            self.conts.pop(pending.seq_id, None)
+            if pending.group is not None and self.latest_requests.get(pending.group) is pending:
+                del self.latest_requests[pending.group]
+
+    def _forget_unsent(self, seq_ids):
+        """
+        Forgets requests the backend dropped without sending them
+        """
+        with self.conts_lock:
+            unsent = [self.conts.get(seq_id) for seq_id in seq_ids]
+        for pending in unsent:
+            if pending is not None:
+                self._forget(pending)
+
+    def _sweep_expired(self, now):
+        with self.conts_lock:
+            expired = [pending for pending in self.conts.values() if now - pending.sent_at > self.request_ttl]
+        for pending in expired:
+            self._forget(pending)
+        if expired:
+            Log.debug("Dropped ", len(expired), " requests without a response")
 
 
     def load_initial_targets(self):
         """
-        Get the initial list of files to check
+        Get the initial list of files to check.
+
+        Targets cached by an earlier instance are used straight away, then
+        checked against `stack ide load-targets`; the session is only updated
+        again if they turn out to have changed.
         """
+        cached_targets = read_cached_loadtargets(self.project_path, self.project_name)
+        if cached_targets is not None:
+            Log.debug("Using cached load targets for ", self.project_name)
+            sublime.set_timeout(lambda: self.update_files(cached_targets, changed=False), 0)
+
         initial_targets = stack_ide_loadtargets(self.project_path, self.project_name)
-        sublime.set_timeout(lambda: self.update_files(initial_targets), 0)
+        if not initial_targets and cached_targets is not None:
+            # Most likely stack failed, rather than the project losing all its modules
+            Log.warning("No load targets from stack, keeping the cached ones for ", self.project_name)
+            return
+        if cached_targets is None:
+            sublime.set_timeout(lambda: self.update_files(initial_targets, changed=False), 0)
+        elif set(initial_targets) != set(cached_targets):
+            Log.debug("Load targets changed for ", self.project_name)
+            stale_targets = set(cached_targets) - set(initial_targets)
+            sublime.set_timeout(lambda: self.replace_files(stale_targets, initial_targets), 0)
+
+        if initial_targets and initial_targets != cached_targets:
+            write_cached_loadtargets(self.project_path, self.project_name, initial_targets)
 
 
     def update_new_include_targets(self, filepaths):
@@ -83,16 +203,148 @@ class StackIDE:
             self.include_targets.add(filepath)
         return list(self.include_targets)
 
-    def update_files(self, filenames):
+    def update_files(self, filenames, changed=True):
+        """
+        Has stack-ide compile the files, along with the other include targets.
+        Unless changed is False, e.g. for the initial load, their entries in
+        the symbol index are replaced by those learnt once they have compiled.
+        """
+        self.exp_types.forget_files(filenames)
+        self.span_infos.forget_files(filenames)
+        if changed:
+            self.symbols.mark_stale(filenames)
+        self.is_compiling = True
         new_include_targets = self.update_new_include_targets(filenames)
         self.send_request(Req.update_session_includes(new_include_targets))
-        self.send_request(Req.get_source_errors(), Win(self.window).handle_source_errors)
+        self.refresh_source_errors()
+
+    def refresh_source_errors(self):
+        """
+        Shows the current source errors in all the instance's windows
+        """
+        self.send_request(Req.get_source_errors(), self._handle_source_errors, prepare=self._prepare_source_errors)
+
+    def get_exp_types(self, span, on_types, view=None):
+        """
+        Gets the types of the expressions enclosing the span, as a list of
+        (type, SourceSpan) pairs, innermost first, from the cache if possible.
+        Returns the PendingRequest if stack-ide had to be asked.
+        """
+        generation = self.session_generation
+        type_spans = self.exp_types.lookup(span, generation)
+        if type_spans is not None:
+            on_types(type_spans)
+            return None
+
+        def handle_response(exp_types):
+            type_spans = list(res.parse_exp_types(exp_types, self.names))
+            innermost = type_spans[0][1] if type_spans else None
+            leaf = view is not None and innermost is not None and is_identifier_span(view, innermost)
+            self.exp_types.add(span, generation, type_spans, leaf)
+            on_types(type_spans)
+
+        return self.send_request(Req.get_exp_types(span), handle_response, view)
+
+    def get_span_info(self, span, on_infos):
+        """
+        Gets the info for the identifier at the span, as a list of
+        ((IdProp, IdScope), SourceSpan), from the prefetched span info if possible.
+        """
+        generation = self.session_generation
+        info = self.span_infos.lookup(span.get('spanFilePath'), generation, span.get('spanFromLine'), span.get('spanFromColumn'))
+        if info is not None:
+            on_infos([info])
+            return None
+
+        def handle_response(response):
+            infos = list(res.parse_span_info_response(response, self.names))
+            self.span_infos.add(span.get('spanFilePath'), generation, infos)
+            self.index_span_infos(infos)
+            on_infos(infos)
+
+        return self.send_request(Req.get_exp_info(span), handle_response)
+
+    @property
+    def symbols(self):
+        """
+        The SymbolIndex of the project
+        """
+        return SymbolIndex.for_project(self.project_path)
+
+    def index_span_infos(self, infos):
+        """
+        Adds the definitions in parsed span info to the symbol index, unless
+        they may be from before the files being recompiled were changed
+        """
+        if not self.is_compiling:
+            self.symbols.add_span_infos(infos)
+
+    def index_completions(self, completions):
+        """
+        Adds the project's definitions among ResponseGetAutocompletion contents to
+        the symbol index, on the worker thread, unless they may be out of date
+        like those of index_span_infos
+        """
+        if not self.is_compiling:
+            sublime.set_timeout_async(lambda: self.symbols.add_completions(completions), 0)
+
+    def prefetch(self, view):
+        """
+        Prefetches the span info for the view's identifiers, if enabled,
+        instead of those of the view it was prefetching for before
+        """
+        if not StackIDE.prefetch_span_info or self.session_generation < 1:
+            return
+        self.prefetcher.prefetch(view)
+
+    def _prefetch_active_views(self):
+        for window in self.windows:
+            view = window.active_view()
+            if view and view.file_name() and is_haskell_view(view):
+                self.prefetch(view)
+
+    def _prepare_source_errors(self, source_errors, windows=None):
+        report = ErrorReport(source_errors)
+        for window in windows or self.windows:
+            Win(window).prepare_error_regions(report)
+        return report
+
+    def _handle_source_errors(self, report):
+        for window in self.windows:
+            Win(window).handle_source_errors(report)
+
+    def attach_window(self, window):
+        """
+        Shares this instance with another window on the same project
+        """
+        if window not in self.windows:
+            self.windows.append(window)
+            self.send_request(Req.get_source_errors(), Win(window).handle_source_errors,
+                prepare=lambda source_errors: self._prepare_source_errors(source_errors, [window]))
+
+    def detach_window(self, window_id):
+        """
+        Stops sharing this instance with a (closed) window.
+        Returns True if no windows are left.
+        """
+        self.windows = [window for window in self.windows if window.id() != window_id]
+        if self.windows:
+            self.window = self.windows[0]
+        return not self.windows
+
+    def replace_files(self, stale_filenames, filenames):
+        self.include_targets.difference_update(stale_filenames)
+        self.update_files(filenames, changed=False)
 
     def end(self):
         """
         Ask stack-ide to shut down.
         """
-        Win(self.window).hide_error_panel()
+        for window in self.windows:
+            Win(window).hide_error_panel()
+            Win(window).forget_errors()
+        self.prefetcher.stop()
+        sublime.set_timeout_async(self.symbols.save, 0)
         self.send_request(Req.get_shutdown())
         self.die()
 
@@ -103,9 +355,10 @@ class StackIDE:
         self.is_alive = False
         self.is_active = False
 
-    def handle_response(self, data):
+    def handle_response(self, data, timing=None):
         """
-        Handles JSON responses from the backend
+        Handles JSON responses from the backend, optionally with
+        the ResponseTiming the backend measured for them
         """
         Log.debug("Got response: ", data)
 
@@ -114,7 +367,7 @@ class StackIDE:
         seq_id   = data.get("seq")
 
         if seq_id is not None:
-            self._send_to_handler(contents, seq_id)
+            self._send_to_handler(contents, seq_id, timing)
 
         elif tag == "ResponseWelcome":
             self._handle_welcome(contents)
@@ -131,18 +384,66 @@ class StackIDE:
         else:
             Log.normal("Unhandled response: ", data)
 
-    def _send_to_handler(self, contents, seq_id):
+    def _send_to_handler(self, contents, seq_id, timing=None):
         """
         Looks up a previously registered handler for the incoming response
         """
-        handler = self.conts.get(seq_id)
-        del self.conts[seq_id]
-        if handler is not None:
-            if contents is not None:
-                sublime.set_timeout(lambda:handler(contents), 0)
+        pending = self.conts.get(seq_id)
+        if pending is not None:
+            self._forget(pending)
+            received_at = time.monotonic()
+            kind = request_kind(pending.tag)
+            if timing is not None:
+                Metrics.record(kind, "first byte", timing.first_byte_at - pending.sent_at)
+                Metrics.record(kind, "decode", timing.decode_time)
+            Metrics.record(kind, "response", received_at - pending.sent_at)
+
+            if pending.cancelled:
+                Log.debug("Dropping response for cancelled request ", pending.tag)
+            elif contents is not None and pending.prepare is not None:
+                sublime.set_timeout_async(lambda: self._prepare(pending, contents), 0)
+            elif contents is not None:
+                sublime.set_timeout(lambda:self._dispatch(pending, contents, received_at), 0)
         else:
             Log.warning("Handler not found for seq", seq_id)
 
+    def _prepare(self, pending, contents):
+        """
+        Prepares a response for its handler on the worker thread, timing it,
+        and then passes it on to the main thread
+        """
+        if pending.cancelled:
+            return
+        started = time.monotonic()
+        try:
+            prepared = pending.prepare(contents)
+        except Exception as e:
+            Log.error("Couldn't prepare the response to", pending.tag, ":", e)
+            return
+        finished = time.monotonic()
+        Metrics.record(request_kind(pending.tag), "prepare", finished - started)
+        sublime.set_timeout(lambda: self._dispatch(pending, prepared, finished), 0)
+
+    def _dispatch(self, pending, contents, ready_at):
+        """
+        Runs a response handler on the main thread, timing it
+        """
+        started = time.monotonic()
+        pending.dispatch(contents)
+        finished = time.monotonic()
+
+        kind = request_kind(pending.tag)
+        Metrics.record(kind, "main thread", started - ready_at)
+        Metrics.record(kind, "handler", finished - started)
+        Metrics.record(kind, "total", finished - pending.sent_at)
+
+        if StackIDE.show_latency:
+            status = "{}: {:.0f} ms".format(kind, (finished - pending.sent_at) * 1000)
+            for window in self.windows:
+                view = window.active_view()
+                if view:
+                    view.set_status("stack_ide_latency", status)
+
 
     def _handle_welcome(self, welcome):
         """
@@ -164,6 +465,15 @@ class StackIDE:
         """
         Show a status message for session progress updates.
         """
+        if update_session.get('tag') == 'UpdateStatusDone':
+            self.session_generation += 1
+            self.is_compiling = False
+            sublime.set_timeout_async(self.symbols.save, 0)
+            if self.session_generation == 1 and self.on_ready:
+                sublime.set_timeout(lambda: self.on_ready(self), 0)
+            if StackIDE.prefetch_span_info:
+                sublime.set_timeout(self._prefetch_active_views, 0)
+
         msg = res.parse_update_session(update_session)
         if msg:
             sublime.status_message(msg)
@@ -179,6 +489,32 @@ class StackIDE:
             finally:
                 self.process = None
 
+class PendingRequest:
+    """
+    A request sent to stack-ide whose response has not arrived yet.
+    """
+
+    def __init__(self, seq_id, tag, handler, view_id=None, prepare=None):
+        self.seq_id = seq_id
+        self.tag = tag
+        self.handler = handler
+        self.prepare = prepare # Run on the response off the main thread, before the handler
+        self.group = (tag, view_id) if view_id is not None else None
+        self.sent_at = time.monotonic()
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        Makes sure the handler will not be called for this request.
+        """
+        self.cancelled = True
+
+    def dispatch(self, contents):
+        # The request may have been cancelled while the response waited for the main thread
+        if not self.cancelled:
+            self.handler(contents)
+
+
 env = {}
 
 def reset_env(add_to_PATH):
@@ -207,10 +543,66 @@ def stack_ide_loadtargets(project_path, package):
             universal_newlines=True,
             creationflags=CREATE_NO_WINDOW)
     outs, errs = proc.communicate()
-    # TODO: check response!
+    if proc.returncode != 0:
+        Log.warning("stack ide load-targets failed for ", package, ": ", errs)
+        return []
     return outs.splitlines()
 
 
+def loadtargets_cache_file(project_path, package):
+    name = hashlib.sha1((project_path + os.pathsep + package).encode('UTF-8')).hexdigest()
+    return os.path.join(sublime.cache_path(), 'SublimeStackIDE', 'load-targets', name + '.json')
+
+
+def project_files_hash(project_path):
+    """
+    Hashes the contents of the files that determine a project's load targets,
+    or returns None if there are none.
+    """
+    paths = sorted(glob.glob(os.path.join(project_path, "*.cabal")))
+    paths.append(os.path.join(project_path, "stack.yaml"))
+    digest = hashlib.sha1()
+    found = False
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                contents = f.read()
+        except OSError:
+            continue
+        found = True
+        digest.update(os.path.basename(path).encode('UTF-8') + b'\0' + contents + b'\0')
+    return digest.hexdigest() if found else None
+
+
+def read_cached_loadtargets(project_path, package):
+    """
+    Returns the load targets cached for the project, if its cabal and
+    stack.yaml files haven't changed since, else None.
+    """
+    files_hash = project_files_hash(project_path)
+    if files_hash is None:
+        return None
+    try:
+        with open(loadtargets_cache_file(project_path, package), encoding='UTF-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return cached.get('targets') if cached.get('hash') == files_hash else None
+
+
+def write_cached_loadtargets(project_path, package, targets):
+    files_hash = project_files_hash(project_path)
+    if files_hash is None:
+        return
+    cache_file = loadtargets_cache_file(project_path, package)
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(cache_file, 'w', encoding='UTF-8') as f:
+            json.dump({'hash': files_hash, 'targets': targets}, f)
+    except OSError as e:
+        Log.warning("Couldn't cache load targets: ", e)
+
+
 def stack_ide_start(project_path, package, response_handler):
     """
     Start up a stack-ide subprocess for the window, and a thread to consume its stdout.
@@ -224,38 +616,145 @@ def stack_ide_start(project_path, package, response_handler):
         creationflags=CREATE_NO_WINDOW
         )
 
-    return JsonProcessBackend(process, response_handler)
+    capture = CaptureWriter(capture_file(project_path)) if StackIDE.capture_traffic else None
+    return JsonProcessBackend(process, response_handler, capture)
 
 
 class JsonProcessBackend:
     """
     Handles process communication with JSON.
     """
-    def __init__(self, process, response_handler):
+
+    # Bytes requested from stack-ide's stdout per read
+    read_chunk_size = 64 * 1024
+
+    # Responses at least this long are decoded on the worker pool,
+    # so the reader can carry on buffering the next ones meanwhile
+    large_response_size = 64 * 1024
+
+    # Most requests written to stack-ide's stdin in one go
+    max_batch_size = 32
+
+    # Most requests waiting for the stdin writer. Beyond it the oldest
+    # queries, which are asked again when needed, are dropped to make room
+    max_queued_requests = 1000
+    droppable_tags = {"RequestGetExpTypes", "RequestGetSpanInfo", "RequestGetAutocompletion"}
+
+    def __init__(self, process, response_handler, capture=None):
         self._process = process
         self._response_handler = response_handler
+        self._capture = capture
+        self._encoder = json.JSONEncoder()
+        self._requests = deque() # Requests waiting for the stdin writer
+        self._requests_ready = threading.Condition()
+        self._closed = False
+        self.on_dropped = None # Called with the seq ids of requests that will never be sent
+        self.stdinThread = threading.Thread(target=self.write_stdin)
+        self.stdinThread.start()
+        self._decoders = ThreadPoolExecutor(max_workers=2)
+        self._responses = queue.Queue() # Decoded responses (or Futures for them) in arrival order
+        self.dispatchThread = threading.Thread(target=self.dispatch_responses)
+        self.dispatchThread.start()
         self.stdoutThread = threading.Thread(target=self.read_stdout)
         self.stdoutThread.start()
         self.stderrThread = threading.Thread(target=self.read_stderr)
         self.stderrThread.start()
 
     def send_request(self, request):
+        """
+        Queues a request for the stdin writer, never waiting on the pipe.
+        Returns False if the request was not queued.
+        """
+        tag = request.get('tag')
+        dropped = []
+        with self._requests_ready:
+            if self._closed:
+                Log.warning("Couldn't send request, stack-ide has ended: ", tag)
+                return False
+
+            if len(self._requests) >= self.max_queued_requests:
+                dropped = self._drop_oldest_query()
+            self._requests.append(request)
+            self._requests_ready.notify()
+        self._dropped(dropped)
+        return True
+
+    def _drop_oldest_query(self):
+        for queued in self._requests:
+            if queued.get('tag') in self.droppable_tags:
+                Log.debug("stack-ide request queue is full, dropping queued ", queued.get('tag'))
+                self._requests.remove(queued)
+                return [queued]
+        Log.warning("stack-ide request queue is full of requests that can't be dropped")
+        return []
+
+    def _dropped(self, requests):
+        seq_ids = [request['seq'] for request in requests if 'seq' in request]
+        if seq_ids and self.on_dropped is not None:
+            self.on_dropped(seq_ids)
+
+    def discard(self, seq_id):
+        """
+        Takes a request that has been superseded out of the queue, if it is still
+        waiting there. Returns True if it was, so will never be answered.
+        """
+        with self._requests_ready:
+            for queued in self._requests:
+                if queued.get('seq') == seq_id:
+                    Log.debug("stack-ide is falling behind, dropping queued ", queued.get('tag'))
+                    self._requests.remove(queued)
+                    return True
+        return False
+
+    def write_stdin(self):
+        """
+        Writes queued requests to stack-ide, coalescing whatever has
+        accumulated since the last write into a single write and flush.
+        """
+        while True:
+            with self._requests_ready:
+                while not self._requests and not self._closed:
+                    self._requests_ready.wait()
+                if not self._requests:
+                    break
+                batch = [self._requests.popleft() for _ in range(min(len(self._requests), self.max_batch_size))]
 
-        try:
-            Log.debug("Sending request: ", request)
-            encodedString = json.JSONEncoder().encode(request) + "\n"
-            self._process.stdin.write(bytes(encodedString, 'UTF-8'))
-            self._process.stdin.flush()
-        except BrokenPipeError as e:
-            Log.error("stack-ide unexpectedly died:",e)
-
-            # self.die()
-                # Ideally we would like to die(), so that, if the error is transient,
-                # we attempt to reconnect on the next check_windows() call. The problem
-                # is that the stack-ide (ide-backend, actually) is not cleaning up those
-                # session.* directories and they would keep accumulating, one per second!
-                # So instead we do:
-            self.is_active = False
+            try:
+                for request in batch:
+                    Log.debug("Sending request: ", request)
+                lines = [self._encoder.encode(request) for request in batch]
+                if self._capture:
+                    for line in lines:
+                        self._capture.record(SENT, line)
+                    self._capture.flush()
+                encoded = ''.join(line + "\n" for line in lines)
+                self._process.stdin.write(encoded.encode('UTF-8'))
+                self._process.stdin.flush()
+            except (BrokenPipeError, AttributeError, ValueError) as e:
+                # (AttributeError: the reader already gave up on the process,
+                #  ValueError: stdin was closed under us)
+                Log.error("stack-ide unexpectedly died:",e)
+
+                # self.die()
+                    # Ideally we would like to die(), so that, if the error is transient,
+                    # we attempt to reconnect on the next check_windows() call. The problem
+                    # is that the stack-ide (ide-backend, actually) is not cleaning up those
+                    # session.* directories and they would keep accumulating, one per second!
+                    # So instead we do:
+                self.is_active = False
+                self._dropped(batch)
+                self._close_requests()
+                break
+
+        Log.debug("Stack-IDE stdin process ended.")
+
+    def _close_requests(self):
+        with self._requests_ready:
+            self._closed = True
+            unsent = list(self._requests)
+            self._requests.clear()
+            self._requests_ready.notify()
+        self._dropped(unsent)
 
 
     def read_stderr(self):
@@ -276,30 +775,99 @@ class JsonProcessBackend:
 
     def read_stdout(self):
         """
-        Reads JSON responses from stack-ide and dispatch them to
-        various main thread handlers.
-        """
-        while self._process.poll() is None:
-            try:
-                raw = self._process.stdout.readline().decode('UTF-8')
-                if not raw:
-                    return
+        Reads JSON responses from stack-ide and queues them, in order,
+        for dispatch_responses.
 
-                data = None
-                try:
-                    data = json.loads(raw)
-                except:
-                    Log.debug("Got a non-JSON response: ", raw)
-                    continue
+        Responses are newline-terminated. Output is read in chunks into a
+        single buffer and each complete line is decoded straight from it.
+        """
+        stdout = self._process.stdout
+        read = getattr(stdout, 'read1', stdout.read)
+        buf = bytearray()
+        first_byte_at = None # When the line at the start of buf began to arrive
+        try:
+            while True:
+                chunk = read(self.read_chunk_size)
+                if not chunk:
+                    break
+                read_at = time.monotonic()
+                if not buf:
+                    first_byte_at = read_at
+
+                # Only the newly read bytes can contain the end of a line
+                search_from = len(buf)
+                buf.extend(chunk)
+                start = 0
+                while True:
+                    end = buf.find(b'\n', search_from)
+                    if end < 0:
+                        break
+                    self._queue_response(buf, start, end, first_byte_at)
+                    # Whatever follows arrived with this chunk
+                    start = search_from = end + 1
+                    first_byte_at = read_at
+                if start:
+                    del buf[:start]
+
+            if buf.strip():
+                self._queue_response(buf, 0, len(buf), first_byte_at)
+
+        except:
+            Log.warning("Stack-IDE stdout process ending due to exception: ", sys.exc_info())
+            self._process.terminate()
+            self._process = None
+        finally:
+            self._responses.put(None)
+            self._decoders.shutdown(wait=False)
+            self._close_requests()
+            if self._capture:
+                self._capture.close()
+
+        Log.debug("Stack-IDE stdout process ended.")
+
+    def _queue_response(self, buf, start, end, first_byte_at):
+        with memoryview(buf) as view:
+            raw = str(view[start:end], 'UTF-8')
+        if not raw.strip():
+            return
+        if self._capture:
+            self._capture.record(RECEIVED, raw, first_byte_at)
+
+        if len(raw) >= self.large_response_size:
+            self._responses.put(self._decoders.submit(self._decode, raw, first_byte_at))
+        else:
+            decoded = self._decode(raw, first_byte_at)
+            if decoded is not None:
+                self._responses.put(decoded)
 
-                #todo: try catch ?
-                self._response_handler(data)
+    def _decode(self, raw, first_byte_at):
+        """
+        Returns the response decoded from the line and its ResponseTiming
+        """
+        started = time.monotonic()
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            Log.debug("Got a non-JSON response: ", raw)
+            return None
+        decode_time = time.monotonic() - started
+        Log.debug("Decoded ", data.get("tag"), " (", len(raw), " chars) in ",
+                  "{:.1f}".format(decode_time * 1000), "ms")
+        return (data, ResponseTiming(first_byte_at, decode_time))
+
+    def dispatch_responses(self):
+        """
+        Hands decoded responses to the response handler in the order
+        stack-ide sent them, waiting for any still being decoded.
+        """
+        while True:
+            response = self._responses.get()
+            if response is None:
+                break
 
+            try:
+                decoded = response.result() if isinstance(response, Future) else response
+                if decoded is not None:
+                    self._response_handler(*decoded)
             except:
-                Log.warning("Stack-IDE stdout process ending due to exception: ", sys.exc_info())
-                self._process.terminate()
-                self._process = None
-                return
-
-        Log.info("Stack-IDE stdout process ended.")
-
+                Log.error("Failed to handle stack-ide response: ", sys.exc_info())
@@ -12,13 +12,38 @@ try:
 except ImportError:
     from test.stubs import sublime
 
-def send_request(window, request, on_response = None):
+def send_request(window, request, on_response = None, view = None):
     """
     Sends the given request to the (view's) window's stack-ide instance,
-    optionally handling its response
+    optionally handling its response. Passing the view makes the request
+    supersede earlier ones of the same kind for it.
     """
     if StackIDEManager.is_running(window):
-        StackIDEManager.for_window(window).send_request(request, on_response)
+        return StackIDEManager.for_window(window).send_request(request, on_response, view)
+
+def is_ready(window):
+    """
+    Whether the window has a stack-ide instance that isn't busy compiling
+    """
+    return StackIDEManager.is_running(window) and not StackIDEManager.for_window(window).is_compiling
+
+def get_exp_types(window, span, on_types, view = None):
+    """
+    Gets the types of the expressions enclosing the span from the window's
+    stack-ide instance, answering from its cache where possible.
+    See StackIDE.get_exp_types.
+    """
+    if StackIDEManager.is_running(window):
+        return StackIDEManager.for_window(window).get_exp_types(span, on_types, view)
+
+def get_span_info(window, span, on_infos):
+    """
+    Gets the info for the identifier at the span from the window's stack-ide
+    instance, answering from prefetched span info where possible.
+    See StackIDE.get_span_info.
+    """
+    if StackIDEManager.is_running(window):
+        return StackIDEManager.for_window(window).get_span_info(span, on_infos)
 
 def configure_instance(window, settings):
 
@@ -47,11 +72,18 @@ def configure_instance(window, settings):
         # TODO: We should also support single files, which should get their own StackIDE instance
         # which would then be per-view. Have a registry per-view that we check, then check the window.
 
+    elif StackIDEManager.shared_instance(folder):
+        # Another window is already working on this project
+        Log.normal("Sharing stack-ide instance with window", window.id())
+        instance = StackIDEManager.shared_instance(folder)
+        instance.attach_window(window)
+
     else:
         try:
             # If everything looks OK, launch a StackIDE instance
             Log.normal("Initializing window", window.id())
             instance = StackIDE(window, settings)
+            StackIDEManager.backend_pool[pool_key(folder)] = instance
         except FileNotFoundError as e:
             instance = NoStackIDE("instance init failed -- stack not found")
             Log.error(e)
@@ -69,8 +101,15 @@ def configure_instance(window, settings):
     return instance
 
 
+def pool_key(project_path):
+    (_, package) = os.path.split(project_path)
+    return (project_path, package)
+
+
 class StackIDEManager:
     ide_backend_instances = {}
+    backend_pool = {} # Map from (project path, package) to the StackIDE shared by its windows
+    standby_instances = {} # Map from a StackIDE being restarted to its replacement
     settings = None
 
     @classmethod
@@ -96,8 +135,8 @@ class StackIDEManager:
             if win_id not in current_windows:
                 # This is a window that is now closed, we may need to kill its process
                 if instance.is_active:
-                    Log.normal("Stopping stale process for window", win_id)
-                    instance.end()
+                    Log.normal("Releasing stale process for window", win_id)
+                    StackIDEManager.release(win_id, instance)
             else:
                 # This window is still active. There are three possibilities:
                 #  1) it has an alive and active instance.
@@ -117,6 +156,49 @@ class StackIDEManager:
             StackIDEManager.ide_backend_instances[window.id()] = configure_instance(window, cls.settings)
 
 
+    @classmethod
+    def is_monitored(cls, window):
+        """
+        Whether check_windows has already seen the window
+        """
+        return window.id() in StackIDEManager.ide_backend_instances
+
+    @classmethod
+    def close_window(cls, window):
+        """
+        Stops the instance of a window that is about to close
+        """
+        instance = StackIDEManager.ide_backend_instances.get(window.id())
+        if instance and instance.is_active:
+            Log.normal("Releasing process for closing window", window.id())
+            StackIDEManager.release(window.id(), instance)
+        # Until the window is actually gone, make sure check_windows doesn't start a new instance
+        StackIDEManager.ide_backend_instances[window.id()] = NoStackIDE("window closed")
+
+    @classmethod
+    def shared_instance(cls, project_path):
+        """
+        The live instance other windows already have for the project, if any
+        """
+        instance = StackIDEManager.backend_pool.get(pool_key(project_path))
+        return instance if instance and instance.is_active else None
+
+    @classmethod
+    def release(cls, window_id, instance):
+        """
+        Detaches a closed window from its instance, stopping the instance
+        if no other window shares it.
+        """
+        if instance.detach_window(window_id):
+            Log.normal("Stopping process for", instance.project_path)
+            instance.end()
+            if StackIDEManager.backend_pool.get(pool_key(instance.project_path)) is instance:
+                del StackIDEManager.backend_pool[pool_key(instance.project_path)]
+            standby = StackIDEManager.standby_instances.pop(instance, None)
+            if standby:
+                standby.windows = []
+                standby.end()
+
     @classmethod
     def is_running(cls, window):
         if not window:
@@ -135,8 +217,14 @@ class StackIDEManager:
     @classmethod
     def kill_all(cls):
         # Log.normal("Killing all stack-ide-sublime instances:", {k:str(v) for k, v in StackIDEManager.ide_backend_instances.items()})
-        for instance in StackIDEManager.ide_backend_instances.values():
+        # Instances shared by several windows are only ended once
+        for instance in set(StackIDEManager.ide_backend_instances.values()):
             instance.end()
+        for standby in StackIDEManager.standby_instances.values():
+            standby.windows = []
+            standby.end()
+        StackIDEManager.backend_pool = {}
+        StackIDEManager.standby_instances = {}
 
     @classmethod
     def reset(cls):
@@ -147,6 +235,78 @@ class StackIDEManager:
         StackIDEManager.kill_all()
         reset_complaints()
 
+    @classmethod
+    def restart(cls):
+        """
+        Start a replacement for every live instance in the background.
+        The old instances keep serving their windows until their replacements
+        have compiled the project, and are then swapped out (see swap_instance).
+        Windows without a live instance are retried straight away.
+        """
+        Log.normal("Restarting StackIDE")
+        reset_complaints()
+
+        for instance in set(StackIDEManager.ide_backend_instances.values()):
+            if instance.is_active:
+                StackIDEManager.start_standby(instance)
+            else:
+                instance.end()
+
+        StackIDEManager.check_windows()
+
+    @classmethod
+    def start_standby(cls, instance):
+        """
+        Starts a replacement for the instance, dropping any earlier one.
+        It stays out of the instance's windows until it takes over.
+        """
+        previous = StackIDEManager.standby_instances.pop(instance, None)
+        if previous:
+            previous.windows = []
+            previous.end()
+
+        try:
+            window = instance.windows[0] if instance.windows else instance.window
+            standby = StackIDE(window, cls.settings, standby=True,
+                               on_ready=lambda standby: cls.swap_instance(instance, standby))
+        except Exception:
+            Log.error("Failed to start replacement for " + instance.project_path + ", restarting cold:")
+            Log.error(traceback.format_exc())
+            instance.end()
+            return
+
+        StackIDEManager.standby_instances[instance] = standby
+
+    @classmethod
+    def swap_instance(cls, instance, standby):
+        """
+        Hands the windows of an instance over to its replacement, now that
+        the replacement is ready, and shuts the old one down.
+        """
+        if StackIDEManager.standby_instances.get(instance) is not standby:
+            return
+        del StackIDEManager.standby_instances[instance]
+
+        if not instance.is_alive:
+            # Its windows have closed meanwhile
+            standby.windows = []
+            standby.end()
+            return
+
+        Log.normal("Switching to restarted process for", instance.project_path)
+        standby.windows = instance.windows
+        standby.window = instance.windows[0]
+        for window_id, current in StackIDEManager.ide_backend_instances.items():
+            if current is instance:
+                StackIDEManager.ide_backend_instances[window_id] = standby
+        if StackIDEManager.backend_pool.get(pool_key(instance.project_path)) is instance:
+            StackIDEManager.backend_pool[pool_key(instance.project_path)] = standby
+
+        # The windows now belong to the replacement, so leave their panels alone
+        instance.windows = []
+        instance.end()
+        standby.refresh_source_errors()
+
     @classmethod
     def configure(cls, settings):
         cls.settings = settings
@@ -0,0 +1,165 @@
+import os
+import json
+import threading
+
+from log import Log
+
+
+def index_file(project_path):
+    return os.path.join(project_path, '.stack-work', 'sublime-stack-ide', 'symbols.json')
+
+
+class SymbolIndex:
+    """
+    Where the project's own top-level names are defined, per source file, as
+    learnt from span info and autocompletion responses. It is kept on disk
+    under .stack-work, so that go to definition works from the moment the
+    project is opened, and while stack-ide is recompiling, as well as once it
+    is up. The definitions of a changed file are kept until the first one
+    learnt after it has compiled, which replaces them all.
+
+    On disk, each file's definitions are stored as one flat list:
+
+        {"version": 1, "files": {"src/Lib.hs": {"module": "Lib", "names": ["someFunc", 9, 1, ...]}}}
+    """
+
+    version = 1
+
+    indexes = {} # Map from project path to its SymbolIndex
+    lock = threading.Lock() # Completions are indexed on the worker thread
+
+    def __init__(self, project_path):
+        self.project_path = project_path
+        self.path = index_file(project_path)
+        self.files = {} # Map from file path to (module name, {name: (line, column)})
+        self.dirty = False # Changed since last saved
+        self.changes = 0 # Bumped on every change
+        self.stale = set() # Files changed since their definitions were learnt
+
+    @classmethod
+    def for_project(cls, project_path):
+        """
+        The index of the project, loaded from disk when first asked for
+        """
+        with cls.lock:
+            index = cls.indexes.get(project_path)
+            if index is None:
+                index = cls.indexes[project_path] = cls(project_path)
+                index._load()
+        return index
+
+    def add(self, name, module, span):
+        """
+        Records that the name, exported from module, is defined at the SourceSpan
+        """
+        if span is None or not name or not span.filePath:
+            return
+        with self.lock:
+            self._record(span.filePath, module, name, (span.fromLine, span.fromColumn))
+
+    def add_span_infos(self, infos):
+        """
+        Indexes the definitions in parsed span info, as ((IdProp, IdScope), SourceSpan)
+        """
+        for ((props, scope), span) in infos:
+            # Local bindings, and binding sites, aren't imported from anywhere
+            if scope is not None:
+                self.add(props.name, props.module, props.defSpan)
+
+    def add_completions(self, contents):
+        """
+        Indexes the definitions in ResponseGetAutocompletion contents, reading just
+        the few fields needed from the JSON: most items are defined in other packages
+        """
+        for item in contents:
+            prop = item.get('idProp')
+            def_span = prop.get('idDefSpan') or {}
+            if def_span.get('tag') == 'ProperSpan':
+                span = def_span.get('contents')
+                with self.lock:
+                    self._record(span.get('spanFilePath'), prop.get('idDefinedIn').get('moduleName'),
+                                 prop.get('idName'), (span.get('spanFromLine'), span.get('spanFromColumn')))
+
+    def _record(self, filepath, module, name, location):
+        """
+        Records a definition, with the lock held, replacing those of the file if it is stale
+        """
+        (old_module, names) = self.files.get(filepath, (None, {}))
+        if filepath in self.stale:
+            self.stale.discard(filepath)
+            names = {}
+        elif old_module == module and names.get(name) == location:
+            return
+        names[name] = location
+        self.files[filepath] = (module, names)
+        self.dirty = True
+        self.changes += 1
+
+    def mark_stale(self, filepaths):
+        """
+        Marks the files as changed, so that the definitions learnt once they
+        have compiled replace those they had
+        """
+        with self.lock:
+            self.stale.update(filepaths)
+
+    def find(self, name):
+        """
+        Returns the (module, file path, line, column) of each definition of the name
+        """
+        with self.lock:
+            return [(module, filepath) + names[name]
+                    for (filepath, (module, names)) in sorted(self.files.items()) if name in names]
+
+    def symbols(self):
+        """
+        Returns every (name, module, file path, line, column) in the index
+        """
+        with self.lock:
+            return [(name, module, filepath) + location
+                    for (filepath, (module, names)) in self.files.items()
+                    for (name, location) in names.items()]
+
+    def save(self):
+        """
+        Writes the index to disk if it has changed, replacing the old one in one go.
+        Nothing is written for a project stack hasn't built yet, i.e. without a .stack-work.
+        """
+        with self.lock:
+            if not self.dirty or not os.path.isdir(os.path.dirname(os.path.dirname(self.path))):
+                return
+            files = {filepath: {"module": module, "names": [field for (name, (line, column)) in sorted(names.items())
+                                                              for field in (name, line, column)]}
+                     for (filepath, (module, names)) in self.files.items()}
+            self.dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='UTF-8') as f:
+                json.dump({"version": self.version, "files": files}, f, separators=(',', ':'))
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            Log.warning("Could not save the symbol index to", self.path, e)
+
+    def _load(self):
+        """
+        Reads the index from disk, leaving out files that have since been deleted
+        """
+        try:
+            with open(self.path, encoding='UTF-8') as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            Log.warning("Ignoring unreadable symbol index", self.path, e)
+            return
+        if saved.get("version") != self.version:
+            return
+
+        for (filepath, entry) in saved.get("files", {}).items():
+            if not os.path.isfile(os.path.join(self.project_path, filepath)):
+                self.dirty = True
+                continue
+            fields = entry.get("names")
+            names = {fields[i]: (fields[i + 1], fields[i + 2]) for i in range(0, len(fields) - 2, 3)}
+            self.files[filepath] = (entry.get("module"), names)
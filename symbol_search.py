@@ -0,0 +1,229 @@
+try:
+    import sublime
+except ImportError:
+    from test.stubs import sublime
+
+import re
+import heapq
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+
+from symbol_index import SymbolIndex
+
+# The set bits of each byte value, lowest first
+BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+NONZERO = re.compile(b'[^\x00]')
+
+
+class SymbolMatcher:
+    """
+    Ranked fuzzy search of symbol names, fast enough to run on each keystroke
+    over a few hundred thousand of them. Matches are ranked by tier:
+
+        1. names starting with the query
+        2. names containing the query
+        3. names containing its characters in order
+
+    and then shortest first. Symbols are numbered in that second order, so
+    the best matches of a tier are those with the lowest numbers.
+
+    Names starting with the query are found by bisecting the names in
+    alphabetical order. For the other tiers, the names containing every
+    character of the query are found by and-ing a bitset per character,
+    and only those names are tried, or for a few thousand, scanned in one
+    go. The complete set of matches found for a query is kept, so that the
+    next keystroke only tries those.
+    """
+
+    max_results = 100
+
+    # Candidates tried one by one for all tiers at once
+    max_tried = 4000
+
+    # Candidates matched against all tiers at once by one regex over their
+    # names; for more, the text of every name is first searched for the query
+    max_scanned = 12000
+
+    # Complete match sets of recent queries kept
+    max_narrowed = 32
+
+    matchers = {} # Map from project path to (changes, SymbolMatcher) of its SymbolIndex
+    building = set() # Project paths whose matcher is being built
+    lock = threading.Lock()
+
+    def __init__(self, symbols):
+        self.symbols = sorted(symbols, key=lambda symbol: (len(symbol[0]), symbol[0]))
+        self.names = [symbol[0].lower() for symbol in self.symbols]
+        self.text = '\n'.join(self.names) + '\n'
+        self.starts = [] # Where each name starts in the text
+        self.alphabetical = sorted(range(len(self.names)), key=self.names.__getitem__)
+        self.sorted_names = [self.names[i] for i in self.alphabetical]
+
+        self.mask_bytes = len(self.names) // 8 + 1
+        bitsets = {}
+        start = 0
+        for (i, name) in enumerate(self.names):
+            self.starts.append(start)
+            start += len(name) + 1
+            (byte, bit) = (i >> 3, 1 << (i & 7))
+            for char in set(name):
+                bitset = bitsets.get(char)
+                if bitset is None:
+                    bitset = bitsets[char] = bytearray(self.mask_bytes)
+                bitset[byte] |= bit
+        self.masks = {char: int.from_bytes(bitset, 'little') for (char, bitset) in bitsets.items()}
+        self.narrowed = OrderedDict() # Map from query to the mask of every name matching it
+
+    @classmethod
+    def for_project(cls, project_path):
+        """
+        The matcher for the symbols of the project's SymbolIndex, or None until
+        there is one. It is built on the worker thread, after loading the index
+        if need be, and rebuilt when the index changes, returning the previous
+        one in the meantime.
+        """
+        index = SymbolIndex.indexes.get(project_path)
+        with cls.lock:
+            (changes, matcher) = cls.matchers.get(project_path, (None, None))
+            stale = (index is None or changes != index.changes) and project_path not in cls.building
+            if stale:
+                cls.building.add(project_path)
+        if stale:
+            sublime.set_timeout_async(lambda: cls._build(project_path), 0)
+        return matcher
+
+    @classmethod
+    def _build(cls, project_path):
+        index = SymbolIndex.for_project(project_path)
+        changes = index.changes
+        matcher = cls(index.symbols())
+        with cls.lock:
+            cls.matchers[project_path] = (changes, matcher)
+            cls.building.discard(project_path)
+
+    def match(self, query, limit=None):
+        """
+        Returns the (name, module, file path, line, column) of the best matches for the query
+        """
+        limit = limit or self.max_results
+        query = query.strip().lower()
+        if not query:
+            return self.symbols[:limit]
+
+        found = self._prefixed(query, limit)
+        if len(found) < limit:
+            found.extend(self._contained(query, limit - len(found)))
+        return [self.symbols[i] for i in found]
+
+    def _prefixed(self, query, limit):
+        lo = bisect_left(self.sorted_names, query)
+        hi = bisect_left(self.sorted_names, query + '\U0010ffff', lo)
+        return heapq.nsmallest(limit, self.alphabetical[lo:hi])
+
+    def _contained(self, query, limit):
+        """
+        The best names containing the query, and then its characters in order,
+        that don't start with it
+        """
+        candidates = self._narrowest(query)
+        for char in set(query):
+            candidates &= self.masks.get(char, 0)
+        count = bin(candidates).count('1')
+        fuzzy = re.compile('.*?'.join(re.escape(char) for char in query))
+
+        if count <= self.max_tried:
+            # Try every candidate, remembering which match for the next keystroke
+            contained = []
+            matched = []
+            matches = bytearray(self.mask_bytes)
+            for i in self._indices(candidates):
+                name = self.names[i]
+                if query in name:
+                    matches[i >> 3] |= 1 << (i & 7)
+                    if not name.startswith(query):
+                        contained.append(i)
+                elif fuzzy.search(name):
+                    matches[i >> 3] |= 1 << (i & 7)
+                    matched.append(i)
+            self._narrow(query, int.from_bytes(matches, 'little'))
+            return (contained + matched)[:limit]
+
+        if count <= self.max_scanned:
+            # Scan the candidates' names in one go, which is quicker than trying
+            # them one by one: first for the query itself, and unless that finds
+            # enough, for its characters in order, remembering which match
+            indices = list(self._indices(candidates))
+            text = '\n'.join([self.names[i] for i in indices])
+            contained = []
+            for i in self._scan(text, indices, re.escape(query)):
+                if not self.names[i].startswith(query):
+                    contained.append(i)
+                    if len(contained) >= limit:
+                        return contained
+            matched = []
+            matches = bytearray(self.mask_bytes)
+            in_order = ''.join(re.escape(char) + '[^\n' + re.escape(next_char) + ']*'
+                               for (char, next_char) in zip(query, query[1:])) + re.escape(query[-1])
+            for i in self._scan(text, indices, in_order):
+                matches[i >> 3] |= 1 << (i & 7)
+                if query not in self.names[i]:
+                    matched.append(i)
+            self._narrow(query, int.from_bytes(matches, 'little'))
+            return (contained + matched)[:limit]
+
+        # Too many to scan: look for the query itself in the text of every name,
+        # and only try candidates in order until there are enough matches
+        found = []
+        for match in re.finditer(re.escape(query), self.text):
+            i = bisect_left(self.starts, match.start() + 1) - 1
+            if (not found or found[-1] != i) and not self.names[i].startswith(query):
+                found.append(i)
+                if len(found) >= limit:
+                    return found
+        for i in self._indices(candidates):
+            name = self.names[i]
+            if query not in name and fuzzy.search(name):
+                found.append(i)
+                if len(found) >= limit:
+                    break
+        return found
+
+    def _scan(self, text, indices, pattern):
+        """
+        The numbers of the names matching the pattern (within a line) in the
+        text of the names numbered indices, one per line
+        """
+        (line, line_start) = (0, 0)
+        for match in re.finditer(pattern + '[^\n]*', text):
+            line += text.count('\n', line_start, match.start())
+            line_start = match.start()
+            yield indices[line]
+
+    def _narrowest(self, query):
+        """
+        The mask of every name matching the longest recent query that query extends,
+        or of every name
+        """
+        for end in range(len(query), 0, -1):
+            mask = self.narrowed.get(query[:end])
+            if mask is not None:
+                self.narrowed.move_to_end(query[:end])
+                return mask
+        return (1 << len(self.names)) - 1
+
+    def _narrow(self, query, mask):
+        self.narrowed[query] = mask
+        self.narrowed.move_to_end(query)
+        while len(self.narrowed) > self.max_narrowed:
+            self.narrowed.popitem(last=False)
+
+    def _indices(self, mask):
+        """
+        The numbers of the names in the mask, lowest first
+        """
+        data = mask.to_bytes(self.mask_bytes, 'little')
+        for match in NONZERO.finditer(data):
+            byte = match.start()
+            for bit in BITS[data[byte]]:
+                yield byte * 8 + bit
@@ -0,0 +1,36 @@
+"""
+Times Win.handle_source_errors on a synthetic ResponseGetSourceErrors.
+
+Run from the repository root with:
+    python -m test.bench.bench_errors [number of errors]
+"""
+import sys
+import timeit
+
+from win import Win
+from .fakes import FakeWindow
+from .traces import source_errors
+
+FILES = 80
+
+
+def main(count=10000, repeat=5):
+    window = FakeWindow('/project', ["src/Module{}.hs".format(i) for i in range(FILES)])
+    errors = source_errors(count)
+
+    def report():
+        # Start from scratch so every run redraws everything
+        Win(window).forget_errors()
+        Win(window).handle_source_errors(errors)
+
+    best = min(timeit.repeat(report, number=1, repeat=repeat))
+    highlighted = sum(len(regions) for view in window.views() for regions in view.regions.values())
+    print("handle_source_errors: {} errors in {} files: {:.1f} ms, {} regions".format(
+        count, FILES, best * 1000, highlighted))
+
+    unchanged = min(timeit.repeat(lambda: Win(window).handle_source_errors(errors), number=1, repeat=repeat))
+    print("handle_source_errors, unchanged report: {:.1f} ms".format(unchanged * 1000))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,111 @@
+"""
+Replays synthetic stack-ide traces through the plugin, headless, and
+reports throughput and memory for each hot path.
+
+Run from the repository root with:
+    python -m test.bench.bench_plugin [scale]
+
+where scale multiplies the size of every payload (default 1).
+"""
+import sys
+from unittest.mock import patch
+
+import response as res
+from req import Req
+from settings import Settings
+from stack_ide import StackIDE
+from stack_ide_manager import StackIDEManager
+from event_listeners import StackIDEAutocompleteHandler
+from completions import CompletionCache, CompletionStore
+from win import Win, ErrorReport
+from test.fakebackend import FakeBackend
+from . import traces
+from .fakes import FakeWindow
+from .harness import run
+
+FILES = 80
+
+
+def replay(instance, trace):
+    """
+    Sends each request of a trace and lets the backend answer with the
+    recorded response, as it would during an editing session
+    """
+    for (request, handler) in trace:
+        instance.send_request(request, handler)
+
+
+def benchmarks(scale=1):
+    window = FakeWindow('/project', ["src/Module{}.hs".format(i) for i in range(FILES)])
+    view = window.active_view()
+
+    errors = traces.source_errors(10000 * scale, FILES)
+    completions = traces.autocompletions(5000 * scale)
+    exp_types = traces.exp_types(50 * scale, "src/Module0.hs")
+    type_spans = list(res.parse_exp_types(exp_types))
+    span_info = traces.span_info(20 * scale)
+
+    backend = FakeBackend({
+        'RequestGetSourceErrors': traces.response('ResponseGetSourceErrors', errors),
+        'RequestGetAutocompletion': traces.response('ResponseGetAutocompletion', completions),
+        'RequestGetExpTypes': traces.response('ResponseGetExpTypes', exp_types),
+        'RequestGetSpanInfo': traces.response('ResponseGetSpanInfo', span_info),
+    })
+    with patch('stack_ide.stack_ide_loadtargets', return_value=[]):
+        instance = StackIDE(window, Settings("none", [], False), backend)
+    StackIDEManager.ide_backend_instances[window.id()] = instance
+
+    autocomplete = StackIDEAutocompleteHandler()
+
+    def forget_completions():
+        autocomplete.cache = CompletionCache()
+
+    def query_completions():
+        return autocomplete.on_query_completions(view, "m", [0])
+
+    def redraw_errors():
+        Win(window).forget_errors()
+
+    prepared = []
+
+    def prepare_errors():
+        redraw_errors()
+        report = ErrorReport(errors)
+        Win(window).prepare_error_regions(report)
+        prepared[:] = [report]
+
+    span = {"spanFilePath": "src/Module0.hs", "spanFromLine": 10, "spanFromColumn": 30,
+            "spanToLine": 10, "spanToColumn": 30}
+    trace = [
+        (Req.get_source_errors(), Win(window).handle_source_errors),
+        (Req.get_autocompletion("src/Module0.hs", "m"), lambda contents: CompletionStore(res.parse_completions(contents))),
+        (Req.get_exp_types(span), lambda contents: Win(window).highlight_type(list(res.parse_exp_types(contents)))),
+        (Req.get_exp_info(span), res.parse_span_info_response),
+    ]
+
+    return [
+        ("parse_source_errors ({})".format(len(errors)), lambda: list(res.parse_source_errors(errors)), None),
+        ("parse_autocompletions ({})".format(len(completions)), lambda: list(res.parse_autocompletions(completions)), None),
+        ("parse_completions ({})".format(len(completions)), lambda: list(res.parse_completions(completions)), None),
+        ("parse_exp_types ({})".format(len(exp_types)), lambda: list(res.parse_exp_types(exp_types)), None),
+        ("parse_span_info_response ({})".format(len(span_info)), lambda: list(res.parse_span_info_response(span_info)), None),
+        ("handle_source_errors, redraw", lambda: Win(window).handle_source_errors(errors), redraw_errors),
+        ("handle_source_errors, unchanged", lambda: Win(window).handle_source_errors(errors), None),
+        ("prepare source errors, worker thread", lambda: Win(window).prepare_error_regions(ErrorReport(errors)), None),
+        ("handle prepared source errors, main thread", lambda: Win(window).handle_source_errors(prepared[0]), prepare_errors),
+        ("highlight_type", lambda: Win(window).highlight_type(type_spans), None),
+        ("on_query_completions, uncached", query_completions, forget_completions),
+        ("on_query_completions, cached", query_completions, None),
+        ("replay session trace", lambda: replay(instance, trace), redraw_errors),
+    ]
+
+
+def main(scale=1):
+    try:
+        run(benchmarks(scale))
+    finally:
+        StackIDEManager.ide_backend_instances.clear()
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,52 @@
+"""
+Replays a capture of a real session (see the capture_traffic setting)
+through StackIDE, headless, and prints the resulting request latencies.
+
+Run from the repository root with:
+    python -m test.bench.bench_replay <capture file> [speed]
+
+A speed of 0 (the default) replays as fast as possible.
+"""
+import sys
+from unittest.mock import patch
+
+import response as res
+from capture import ReplayBackend
+from completions import CompletionStore
+from metrics import Metrics
+from settings import Settings
+from stack_ide import StackIDE
+from win import Win
+from .fakes import FakeWindow
+
+
+def handlers(window):
+    """
+    What the plugin does with each kind of response
+    """
+    return {
+        'RequestGetSourceErrors': Win(window).handle_source_errors,
+        'RequestGetExpTypes': lambda contents: Win(window).highlight_type(list(res.parse_exp_types(contents))),
+        'RequestGetAutocompletion': lambda contents: CompletionStore(res.parse_completions(contents)),
+        'RequestGetSpanInfo': lambda contents: list(res.parse_span_info_response(contents)),
+    }
+
+
+def main(path, speed=0):
+    window = FakeWindow('/project')
+    backend = ReplayBackend(path, float(speed))
+    with patch('stack_ide.stack_ide_loadtargets', return_value=[]):
+        instance = StackIDE(window, Settings("none", [], False), backend)
+    by_tag = handlers(window)
+
+    def resend(request):
+        handler = by_tag.get(request.get('tag'), lambda contents: None) if 'seq' in request else None
+        instance.send_request({'tag': request.get('tag'), 'contents': request.get('contents')}, handler)
+
+    Metrics.reset()
+    backend.play(resend)
+    print(Metrics.report())
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
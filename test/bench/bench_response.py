@@ -0,0 +1,79 @@
+"""
+Compares parsing large responses into response.py's slotted classes, with
+shared names, against the same classes backed by a __dict__ per instance
+and keeping every name decoded, as they used to.
+
+Run from the repository root with:
+    python -m test.bench.bench_response [scale]
+"""
+import sys
+import json
+from unittest.mock import patch
+
+import response as res
+from completions import CompletionStore
+from . import traces
+from .harness import run
+
+CLASSES = ['SourceError', 'SourceSpan', 'IdScope', 'IdImportedFrom', 'IdProp']
+
+
+def with_instance_dicts():
+    """
+    Patches response.py to build the same classes without __slots__,
+    spans through the old generic key lookup, and no shared names
+    """
+    replacements = {name: type(name, (), {
+        '__init__': getattr(res, name).__init__,
+        '__repr__': getattr(res, name).__repr__,
+    }) for name in CLASSES}
+
+    def parse_source_span(json):
+        paths = ['spanFilePath', 'spanFromLine', 'spanFromColumn', 'spanToLine', 'spanToColumn']
+        fields = list(json.get(path) for path in paths)
+        return replacements['SourceSpan'](*fields) if fields else None
+
+    class Unshared(res.NameTable):
+        def name(self, name):
+            return name
+
+        def scope(self, module, package):
+            return replacements['IdScope'](replacements['IdImportedFrom'](module, package))
+
+    return patch.multiple(res, parse_source_span=parse_source_span, default_names=Unshared(), **replacements)
+
+
+def decoded(contents):
+    """
+    The contents as they come out of the JSON decoder, with a separate copy of each string
+    """
+    return json.loads(json.dumps(contents))
+
+
+def benchmarks(scale=1):
+    completions = decoded(traces.autocompletions(20000 * scale))
+    errors = decoded(traces.source_errors(20000 * scale))
+    span_info = decoded(traces.span_info(1000 * scale))
+    completions_text = json.dumps(completions)
+    cases = [
+        ("parse_autocompletions ({})".format(len(completions)), lambda: list(res.parse_autocompletions(completions))),
+        # Decoded in the call, so that memory retained shows whatever the store keeps of the response
+        ("CompletionStore from JSON ({})".format(len(completions)),
+            lambda: CompletionStore(res.parse_completions(json.loads(completions_text)))),
+        ("parse_completions ({})".format(len(completions)), lambda: list(res.parse_completions(completions))),
+        ("parse_source_errors ({})".format(len(errors)), lambda: list(res.parse_source_errors(errors))),
+        ("parse_span_info_response ({})".format(len(span_info)), lambda: list(res.parse_span_info_response(span_info))),
+    ]
+    return [(name, fn, None) for (name, fn) in cases]
+
+
+def main(scale=1):
+    print("__dict__ per instance:")
+    with with_instance_dicts():
+        run(benchmarks(scale))
+    print("__slots__, shared names:")
+    run(benchmarks(scale))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,48 @@
+"""
+Times SymbolMatcher on a large project's worth of symbols, a keystroke at a
+time, as the goto_hs_symbol command does. Each keystroke should take well
+under 10 ms.
+
+Run from the repository root with:
+    python -m test.bench.bench_symbols [number of symbols]
+"""
+import sys
+import time
+
+from symbol_search import SymbolMatcher
+from .traces import symbols
+
+QUERIES = ["parseModuleHeader", "pmh", "hmp", "insertwith", "sessionRequest", "lookupfrmjsn", "ea", "zzqx"]
+
+
+def typing(matcher, query, repeat):
+    """
+    The best time of each keystroke typing the query, starting afresh each time
+    """
+    best = [float('inf')] * len(query)
+    for _ in range(repeat):
+        matcher.narrowed.clear()
+        for end in range(1, len(query) + 1):
+            started = time.perf_counter()
+            found = matcher.match(query[:end])
+            best[end - 1] = min(best[end - 1], time.perf_counter() - started)
+    return (best, found)
+
+
+def main(count=200000, repeat=5):
+    named = symbols(count)
+    started = time.perf_counter()
+    matcher = SymbolMatcher(named)
+    print("index {} symbols: {:.1f} ms".format(count, (time.perf_counter() - started) * 1000))
+
+    slowest = 0.0
+    for query in QUERIES:
+        (best, found) = typing(matcher, query, repeat)
+        slowest = max(slowest, max(best))
+        print("{:<20} slowest keystroke {:>6.2f} ms, mean {:>6.2f} ms, {:>3} matches, best {}".format(
+            query, max(best) * 1000, sum(best) / len(best) * 1000, len(found), found[0][0] if found else None))
+    print("slowest keystroke overall: {:.2f} ms".format(slowest * 1000))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
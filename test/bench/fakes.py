@@ -0,0 +1,105 @@
+"""
+Lightweight stand-ins for Sublime windows and views.
+
+unittest.mock records every call, which would dominate the timings,
+so benchmarks use these instead.
+"""
+import os
+from itertools import count
+
+from test.stubs import sublime
+
+view_ids = count(1)
+LINE_LENGTH = 80
+LINES = 2000
+TEXT = ("x" * (LINE_LENGTH - 1) + "\n") * LINES # The text of every view
+
+
+class FakeView():
+
+    def __init__(self, window, file_name):
+        self._id = next(view_ids)
+        self._window = window
+        self._file_name = file_name
+        self.regions = {}
+
+    def id(self):
+        return self._id
+
+    def window(self):
+        return self._window
+
+    def file_name(self):
+        return self._file_name
+
+    def size(self):
+        return len(TEXT)
+
+    def change_count(self):
+        return 0
+
+    def substr(self, region):
+        return TEXT[region.begin():region.end()]
+
+    def text_point(self, row, col):
+        return row * LINE_LENGTH + col
+
+    def rowcol(self, point):
+        return divmod(point, LINE_LENGTH)
+
+    def sel(self):
+        return [sublime.Region(0, 0)]
+
+    def match_selector(self, point, selector):
+        return True
+
+    def add_regions(self, key, regions, scope="", icon="", flags=0):
+        self.regions[key] = regions
+
+    def set_status(self, key, value):
+        pass
+
+    def run_command(self, command, args=None):
+        pass
+
+    def settings(self):
+        return sublime.Settings()
+
+    def set_read_only(self, read_only):
+        pass
+
+
+class FakeWindow():
+
+    def __init__(self, folder, paths=()):
+        self._folder = folder
+        self._views = [FakeView(self, os.path.join(folder, path)) for path in paths]
+        self._views_by_file = {view.file_name(): view for view in self._views}
+        self.panel = FakeView(self, None)
+
+    def id(self):
+        return id(self)
+
+    def folders(self):
+        return [self._folder]
+
+    def views(self):
+        return self._views
+
+    def active_view(self):
+        return self._views[0] if self._views else None
+
+    def find_open_file(self, file_name):
+        return self._views_by_file.get(file_name)
+
+    def open_file(self, file_name, flags=0):
+        view = FakeView(self, file_name)
+        self._views.append(view)
+        self._views_by_file[file_name] = view
+        return view
+
+    def create_output_panel(self, name):
+        return self.panel
+
+    def run_command(self, command, args=None):
+        pass
@@ -0,0 +1,79 @@
+"""
+Measures throughput and memory use of plugin code paths.
+"""
+import gc
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError: # Python < 3.4
+    tracemalloc = None
+
+
+class Result:
+
+    def __init__(self, name, ops_per_sec, best, peak_bytes, retained_bytes, retained_blocks=None):
+        self.name = name
+        self.ops_per_sec = ops_per_sec
+        self.best = best
+        self.peak_bytes = peak_bytes
+        self.retained_bytes = retained_bytes
+        self.retained_blocks = retained_blocks
+
+    def __str__(self):
+        memory = ""
+        if self.peak_bytes is not None:
+            memory = "{:>10.1f} KiB peak {:>10.1f} KiB retained {:>8} blocks".format(
+                self.peak_bytes / 1024, self.retained_bytes / 1024, self.retained_blocks)
+        return "{:<40} {:>12.1f} ops/s {:>10.3f} ms  {}".format(self.name, self.ops_per_sec, self.best * 1000, memory)
+
+
+def measure(name, fn, setup=None, repeat=5, min_time=0.2):
+    """
+    Times fn, after calling setup (if given) before each call, and reports
+    the best run. Memory is measured over one extra call: the peak traced
+    allocation size, and the size and number of the blocks it allocated
+    that were still allocated when it returned.
+    """
+    timings = []
+    for _ in range(repeat):
+        calls = 0
+        elapsed = 0.0
+        while elapsed < min_time or calls == 0:
+            if setup:
+                setup()
+            started = time.perf_counter()
+            fn()
+            elapsed += time.perf_counter() - started
+            calls += 1
+        timings.append(elapsed / calls)
+
+    peak_bytes = None
+    retained_bytes = None
+    retained_blocks = None
+    if tracemalloc:
+        if setup:
+            setup()
+        gc.collect()
+        tracemalloc.start()
+        retained = fn()
+        (retained_bytes, peak_bytes) = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        del retained
+        # Not counting the harness's own, e.g. the tuple of traced sizes
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, __file__)])
+        retained_blocks = sum(stat.count for stat in snapshot.statistics('filename'))
+
+    best = min(timings)
+    return Result(name, 1 / best if best else float('inf'), best, peak_bytes, retained_bytes, retained_blocks)
+
+
+def run(benchmarks, out=sys.stdout):
+    results = []
+    for (name, fn, setup) in benchmarks:
+        result = measure(name, fn, setup)
+        print(result, file=out)
+        results.append(result)
+    return results
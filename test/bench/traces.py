@@ -0,0 +1,104 @@
+"""
+Synthetic stack-ide responses of configurable size, shaped like the
+recorded ones in test/data.py.
+"""
+
+MODULES = ["Prelude", "Data.List", "Data.Map.Strict", "Control.Monad", "GHC.Base", "Data.Maybe", "Lib"]
+
+
+def span(path, from_line, from_column, to_line, to_column):
+    return {
+        "spanFilePath": path,
+        "spanFromLine": from_line,
+        "spanFromColumn": from_column,
+        "spanToLine": to_line,
+        "spanToColumn": to_column
+    }
+
+
+def module_ref(module):
+    package = "main" if module == "Lib" else "base"
+    return {"moduleName": module, "modulePackage": {"packageName": package, "packageKey": package, "packageVersion": None}}
+
+
+def id_info(name, i):
+    module = MODULES[i % len(MODULES)]
+    if module == "Lib":
+        def_span = {"tag": "ProperSpan", "contents": span("src/Lib.hs", i + 1, 1, i + 1, len(name) + 1)}
+    else:
+        def_span = {"tag": "TextSpan", "contents": "<no location info>"}
+    return {
+        "idProp": {
+            "idSpace": "VarName",
+            "idDefinedIn": module_ref(module),
+            "idHomeModule": module_ref(module),
+            "idType": "a -> [a] -> Maybe a" if i % 4 else None,
+            "idName": name,
+            "idDefSpan": def_span
+        },
+        "idScope": {
+            "tag": "Imported",
+            "idImportedFrom": module_ref(module),
+            "idImportSpan": {"tag": "ProperSpan", "contents": span("app/Main.hs", 3, 1, 3, 20)},
+            "idImportQual": ""
+        }
+    }
+
+
+def autocompletions(count):
+    """
+    Contents of a ResponseGetAutocompletion for the prefix "m"
+    """
+    return [id_info("m{:06d}".format(i), i) for i in range(count)]
+
+
+def span_info(count):
+    """
+    Contents of a ResponseGetSpanInfo
+    """
+    return [[{"tag": "SpanId", "contents": id_info("someFunc{}".format(i), i)}, span("app/Main.hs", 7, 27, 7, 35)]
+            for i in range(count)]
+
+
+def exp_types(depth, path="src/Main.hs"):
+    """
+    Contents of a ResponseGetExpTypes, innermost expression first
+    """
+    return [["IO ()" if i else "String -> IO ()", span(path, 10, max(1, 30 - i), 10 + i, 40 + i)]
+            for i in range(depth)]
+
+
+def source_errors(count, files=80):
+    """
+    Contents of a ResponseGetSourceErrors with errors and warnings interleaved across files
+    """
+    return [{
+        "errorKind": "KindWarning" if i % 3 else "KindError",
+        "errorMsg": "Defined but not used: ‘x{}’".format(i),
+        "errorSpan": {
+            "tag": "ProperSpan",
+            "contents": span("src/Module{}.hs".format(i % files), i // files + 1, 1, i // files + 1, 10)
+        }
+    } for i in range(count)]
+
+
+def response(tag, contents):
+    return {"tag": tag, "contents": contents}
+
+
+WORDS = ["parse", "module", "header", "render", "type", "span", "error", "source", "map", "list",
+         "insert", "lookup", "with", "from", "to", "json", "value", "state", "run", "update",
+         "session", "request", "response", "name", "scope", "import", "export", "file", "path", "view"]
+
+
+def symbols(count, modules=2000):
+    """
+    (name, module, file path, line, column) of camelCase names like a large project's
+    """
+    result = []
+    for i in range(count):
+        words = [WORDS[(i // len(WORDS) ** k) % len(WORDS)] for k in range(1 + i % 3)]
+        name = words[0] + "".join(word.title() for word in words[1:]) + str(i % 97 or "")
+        module = "Project.Module{}".format(i % modules)
+        result.append((name, module, "src/Project/Module{}.hs".format(i % modules), i // modules + 1, 1))
+    return result
@@ -30,6 +30,10 @@ def mock_view(file_path, window):
     view.sel = Mock(return_value=[region])
     view.rowcol = Mock(return_value=(0, 0))
     view.text_point = Mock(return_value=4)
+    text = 'module Main where\n\nmain :: IO ()\nmain = do\n  putStrLn "hello world"\n'
+    view.size = Mock(return_value=len(text))
+    view.substr = Mock(side_effect=lambda region: text[region.begin():region.end()])
+    view.change_count = Mock(return_value=0)
     return view
 
 def setup_fake_backend(window, responses={}):
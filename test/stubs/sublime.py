@@ -1,4 +1,5 @@
 import uuid
+import tempfile
 
 current_status = ""
 current_error = ""
@@ -17,16 +18,27 @@ def set_timeout_async(fn, delay):
 def set_timeout(fn, delay):
     fn()
 
+_cache_path = tempfile.mkdtemp()
+
+def cache_path():
+    return _cache_path
+
 def load_settings(name):
     return Settings()
 
 class Settings():
 
+    def __init__(self):
+        self._values = {}
+
     def add_on_change(self, key, func):
         pass
 
-    def get(self, key, default):
-        return default
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def set(self, key, value):
+        self._values[key] = value
 
 
 class FakeWindow():
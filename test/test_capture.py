@@ -0,0 +1,148 @@
+import os
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import Mock, patch
+import stack_ide as stackide
+import capture
+from capture import CaptureWriter, ReplayBackend, capture_file, read_capture, SENT, RECEIVED
+from req import Req
+from settings import Settings
+from .mocks import mock_window, cur_dir
+from .stubs import sublime
+from .test_stackide import fake_process
+
+
+class CaptureTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'captures', 'session.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+
+class CaptureWriterTests(CaptureTestCase):
+
+    def test_records_messages_in_order(self):
+        writer = CaptureWriter(self.path)
+        writer.record(SENT, '{"tag": "RequestGetSourceErrors"}', at=1.5)
+        writer.record(RECEIVED, '{"tag": "ResponseGetSourceErrors"}', at=2.25)
+        writer.close()
+
+        self.assertEqual([(1.5, SENT, '{"tag": "RequestGetSourceErrors"}'),
+                          (2.25, RECEIVED, '{"tag": "ResponseGetSourceErrors"}')],
+                         list(read_capture(self.path)))
+
+    @patch.object(CaptureWriter, 'max_bytes', 100)
+    @patch.object(CaptureWriter, 'backups', 2)
+    def test_rotates_and_caps_size(self):
+        writer = CaptureWriter(self.path)
+        for i in range(20):
+            writer.record(SENT, json.dumps({'seq': i, 'padding': 'x' * 20}))
+        writer.close()
+
+        self.assertEqual(['session.log', 'session.log.1', 'session.log.2'],
+                         sorted(os.listdir(os.path.dirname(self.path))))
+        for name in os.listdir(os.path.dirname(self.path)):
+            self.assertLessEqual(os.path.getsize(os.path.join(os.path.dirname(self.path), name)), 100)
+        # The newest messages are in the current file
+        self.assertEqual(19, json.loads(list(read_capture(self.path))[-1][2])['seq'])
+
+    def test_ignores_records_after_close(self):
+        writer = CaptureWriter(self.path)
+        writer.close()
+        writer.record(SENT, '{}')
+        self.assertEqual([], list(read_capture(self.path)))
+
+    def test_backend_captures_both_directions(self):
+        writer = CaptureWriter(self.path)
+        response = {'seq': 'a', 'contents': []}
+        (read_fd, write_fd) = os.pipe()
+        process = fake_process(b'')
+        process.stdout = open(read_fd, 'rb')
+        flushed = threading.Event()
+        process.stdin.flush = Mock(side_effect=flushed.set)
+        backend = stackide.JsonProcessBackend(process, Mock(), writer)
+
+        backend.send_request(Req.get_source_errors())
+        flushed.wait(5)
+        os.write(write_fd, json.dumps(response).encode('UTF-8') + b'\n')
+        os.close(write_fd)
+        backend.stdoutThread.join(5)
+        backend.stdinThread.join(5)
+        process.stdout.close()
+
+        entries = [(direction, json.loads(line)) for (at, direction, line) in read_capture(self.path)]
+        self.assertIn((RECEIVED, response), entries)
+        self.assertIn((SENT, Req.get_source_errors()), entries)
+
+
+class CaptureFileTests(CaptureTestCase):
+
+    def test_new_file_per_session(self):
+        with patch.object(sublime, 'cache_path', return_value=self.dir):
+            first = capture_file('/projects/helloworld')
+            second = capture_file('/projects/helloworld')
+        self.assertNotEqual(first, second)
+        self.assertEqual(os.path.dirname(first), os.path.dirname(second))
+        self.assertTrue(os.path.basename(first).startswith('helloworld-'))
+
+    @patch.object(capture, 'max_sessions', 2)
+    def test_keeps_latest_sessions(self):
+        paths = []
+        with patch.object(sublime, 'cache_path', return_value=self.dir):
+            for i in range(4):
+                path = capture_file('/projects/helloworld')
+                CaptureWriter(path).close()
+                open(path + '.1', 'w').close()
+                os.utime(path, (i, i))
+                paths.append(path)
+            other = capture_file('/projects/other')
+            CaptureWriter(other).close()
+
+        remaining = os.listdir(os.path.dirname(paths[0]))
+        self.assertEqual(sorted(os.path.basename(path) for path in [paths[2], paths[2] + '.1', paths[3], paths[3] + '.1', other]), sorted(remaining))
+
+
+@patch('stack_ide.stack_ide_loadtargets', return_value=[])
+class ReplayBackendTests(CaptureTestCase):
+
+    def write_capture(self, entries):
+        writer = CaptureWriter(self.path)
+        for (at, direction, message) in entries:
+            writer.record(direction, json.dumps(message), at)
+        writer.close()
+
+    def test_replays_responses_to_matching_requests(self, loadtargets_mock):
+        self.write_capture([
+            (1.0, SENT, {'tag': 'RequestGetExpTypes', 'contents': {}, 'seq': 'old-1'}),
+            (1.1, SENT, {'tag': 'RequestGetAutocompletion', 'contents': ['a', 'b'], 'seq': 'old-2'}),
+            (1.2, RECEIVED, {'seq': 'old-2', 'contents': ['completions']}),
+            (1.3, RECEIVED, {'seq': 'old-1', 'contents': ['types']}),
+            (1.4, RECEIVED, {'tag': 'ResponseLog', 'contents': 'done'}),
+        ])
+        backend = ReplayBackend(self.path, speed=0)
+        instance = stackide.StackIDE(mock_window([cur_dir + '/projects/helloworld/']), Settings("none", [], False), backend)
+        handlers = {'RequestGetExpTypes': Mock(), 'RequestGetAutocompletion': Mock()}
+
+        backend.play(lambda request: instance.send_request(request, handlers[request['tag']]))
+
+        handlers['RequestGetExpTypes'].assert_called_once_with(['types'])
+        handlers['RequestGetAutocompletion'].assert_called_once_with(['completions'])
+
+    def test_keeps_original_spacing(self, loadtargets_mock):
+        self.write_capture([
+            (10.0, RECEIVED, {'tag': 'ResponseLog', 'contents': 'first'}),
+            (12.0, RECEIVED, {'tag': 'ResponseLog', 'contents': 'second'}),
+        ])
+        backend = ReplayBackend(self.path, speed=4)
+        backend.handler = Mock()
+        with patch('capture.time.sleep') as sleep:
+            backend.play()
+        self.assertEqual(1, sleep.call_count)
+        self.assertAlmostEqual(0.5, sleep.call_args[0][0], places=1)
+        self.assertEqual(2, backend.handler.call_count)
@@ -5,6 +5,7 @@ from .mocks import cur_dir, default_mock_window, setup_fake_backend
 from text_commands import ClearErrorPanelCommand, AppendToErrorPanelCommand, ShowHsTypeAtCursorCommand, ShowHsInfoAtCursorCommand, CopyHsTypeAtCursorCommand, GotoDefinitionAtCursorCommand
 from .stubs import sublime
 from .data import type_info, someFunc_span_info, putStrLn_span_info
+from response import parse_span_info_response
 
 
 class CommandTests(unittest.TestCase):
@@ -88,6 +89,6 @@ class CommandTests(unittest.TestCase):
         (window, view) = default_mock_window()
         cmd.view = view
 
-        cmd._handle_response(putStrLn_span_info.get('contents'))
+        cmd._goto_definition(list(parse_span_info_response(putStrLn_span_info.get('contents'))))
 
         self.assertEqual("Cannot navigate to putStrLn, it is imported from Prelude", sublime.current_status)
@@ -0,0 +1,76 @@
+import unittest
+from completions import CompletionCache, CompletionStore
+from response import Completion, parse_completions
+from .data import many_completions
+
+
+def completion(name):
+    return Completion(name, None, 'Data.List')
+
+completions = [completion(name) for name in ['mapM_', 'max', 'map', 'maximum', 'mapM']]
+store = CompletionStore(completions)
+
+
+def names(formatted):
+    return [name for (_, name) in formatted]
+
+
+class CompletionStoreTests(unittest.TestCase):
+
+    def test_formats_completions(self):
+        self.assertEqual([['length\t[a] -> Int\tPrelude', 'length']],
+                         CompletionStore([Completion('length', '[a] -> Int', 'Prelude')]).formatted)
+
+    def test_formats_parsed_completions(self):
+        formatted = CompletionStore(parse_completions(many_completions.get('contents'))).matching('!!')
+        self.assertEqual([['!!\t\tData.List', '!!']], formatted)
+
+    def test_sorted_by_name(self):
+        self.assertEqual(['map', 'mapM', 'mapM_', 'max', 'maximum'], names(store.formatted))
+
+    def test_matching_prefix(self):
+        self.assertEqual(['map', 'mapM', 'mapM_', 'max', 'maximum'], names(store.matching('')))
+        self.assertEqual(['map', 'mapM', 'mapM_', 'max', 'maximum'], names(store.matching('ma')))
+        self.assertEqual(['mapM', 'mapM_'], names(store.matching('mapM')))
+        self.assertEqual(['max', 'maximum'], names(store.matching('max')))
+        self.assertEqual([], names(store.matching('min')))
+        self.assertEqual([], names(store.matching('a')))
+
+
+class CompletionCacheTests(unittest.TestCase):
+
+    def test_returns_cached_prefix(self):
+        cache = CompletionCache()
+        cache.add('src/Main.hs', 'ma', 1, store)
+        self.assertEqual(store.formatted, cache.lookup('src/Main.hs', 'ma', 1))
+        self.assertIsNone(cache.lookup('src/Lib.hs', 'ma', 1))
+        self.assertIsNone(cache.lookup('src/Main.hs', 'm', 1))
+
+    def test_narrows_shorter_prefix(self):
+        cache = CompletionCache()
+        cache.add('src/Main.hs', 'ma', 1, store)
+        narrowed = cache.lookup('src/Main.hs', 'mapM', 1)
+        self.assertEqual(['mapM', 'mapM_'], names(narrowed))
+
+    def test_does_not_narrow_qualified_or_empty_prefixes(self):
+        cache = CompletionCache()
+        cache.add('src/Main.hs', '', 1, store)
+        cache.add('src/Main.hs', 'M.', 1, store)
+        self.assertIsNone(cache.lookup('src/Main.hs', 'm', 1))
+        self.assertIsNone(cache.lookup('src/Main.hs', 'M.m', 1))
+
+    def test_new_generation_invalidates(self):
+        cache = CompletionCache()
+        cache.add('src/Main.hs', 'ma', 1, store)
+        self.assertIsNone(cache.lookup('src/Main.hs', 'ma', 2))
+        self.assertIsNone(cache.lookup('src/Main.hs', 'ma', 1))
+
+    def test_evicts_least_recently_used(self):
+        cache = CompletionCache(max_entries=2)
+        cache.add('src/Main.hs', 'a', 1, CompletionStore([]))
+        cache.add('src/Main.hs', 'b', 1, CompletionStore([]))
+        cache.lookup('src/Main.hs', 'a', 1)
+        cache.add('src/Main.hs', 'c', 1, CompletionStore([]))
+        self.assertIsNotNone(cache.lookup('src/Main.hs', 'a', 1))
+        self.assertIsNone(cache.lookup('src/Main.hs', 'b', 1))
+        self.assertIsNotNone(cache.lookup('src/Main.hs', 'c', 1))
@@ -0,0 +1,132 @@
+import unittest
+from unittest.mock import Mock, patch
+from exp_types import ExpTypesCache, SpanIndex
+from response import SourceSpan
+from stack_ide_manager import StackIDEManager
+from .mocks import default_mock_window, setup_fake_backend
+
+def span(path, line):
+    return {"spanFilePath": path, "spanFromLine": line, "spanFromColumn": 1, "spanToLine": line, "spanToColumn": 1}
+
+types = [('IO ()', None)]
+
+
+class ExpTypesCacheTests(unittest.TestCase):
+
+    def test_returns_cached_span(self):
+        cache = ExpTypesCache()
+        cache.add(span('src/Main.hs', 3), 1, types)
+        self.assertEqual(types, cache.lookup(span('src/Main.hs', 3), 1))
+        self.assertIsNone(cache.lookup(span('src/Main.hs', 4), 1))
+        self.assertIsNone(cache.lookup(span('src/Lib.hs', 3), 1))
+
+    def test_new_generation_invalidates(self):
+        cache = ExpTypesCache()
+        cache.add(span('src/Main.hs', 3), 1, types)
+        self.assertIsNone(cache.lookup(span('src/Main.hs', 3), 2))
+
+    def test_saved_files_forgotten(self):
+        cache = ExpTypesCache()
+        cache.add(span('src/Main.hs', 3), 1, types)
+        cache.add(span('src/Lib.hs', 3), 1, types)
+        cache.forget_files(['src/Main.hs'])
+        self.assertIsNone(cache.lookup(span('src/Main.hs', 3), 1))
+        self.assertEqual(types, cache.lookup(span('src/Lib.hs', 3), 1))
+
+    def test_evicts_least_recently_used(self):
+        cache = ExpTypesCache(max_entries=2)
+        cache.add(span('src/Main.hs', 1), 1, types)
+        cache.add(span('src/Main.hs', 2), 1, types)
+        cache.lookup(span('src/Main.hs', 1), 1)
+        cache.add(span('src/Main.hs', 3), 1, types)
+        self.assertIsNotNone(cache.lookup(span('src/Main.hs', 1), 1))
+        self.assertIsNone(cache.lookup(span('src/Main.hs', 2), 1))
+
+
+def type_span(type, from_line, from_column, to_line, to_column):
+    return (type, SourceSpan('src/Main.hs', from_line, from_column, to_line, to_column))
+
+# The types for the cursor on `putStrLn` in `main = do putStrLn (show x)`
+put_str_ln = [type_span('String -> IO ()', 4, 13, 4, 21),
+              type_span('IO ()', 4, 13, 4, 31),
+              type_span('IO ()', 4, 8, 4, 31)]
+# The types for the cursor on `show`
+show = [type_span('Int -> String', 4, 23, 4, 27),
+        type_span('String', 4, 22, 4, 31),
+        type_span('IO ()', 4, 13, 4, 31),
+        type_span('IO ()', 4, 8, 4, 31)]
+
+
+class SpanIndexTests(unittest.TestCase):
+
+    def test_answers_inside_known_leaf(self):
+        cache = ExpTypesCache()
+        cache.add(span('src/Main.hs', 4), 1, put_str_ln, leaf=True)
+        cache.add(dict(span('src/Main.hs', 4), spanFromColumn=24, spanToColumn=24), 1, show, leaf=True)
+
+        at = lambda column: cache.lookup(dict(span('src/Main.hs', 4), spanFromColumn=column, spanToColumn=column), 1)
+        self.assertIs(put_str_ln, at(15))
+        self.assertIs(show, at(26))
+        # Inside known spans which aren't leaves: there may be expressions we haven't seen
+        self.assertIsNone(at(22))
+        self.assertIsNone(at(10))
+        # Outside any known span
+        self.assertIsNone(at(40))
+
+    def test_span_enclosing_another_is_not_a_leaf(self):
+        index = SpanIndex()
+        index.add([type_span('IO ()', 4, 13, 4, 31)], leaf=True)
+        self.assertIsNotNone(index.enclosing_leaf((4, 15), (4, 15)))
+        index.add(put_str_ln, leaf=True)
+        self.assertIsNone(index.enclosing_leaf((4, 25), (4, 25)))
+        self.assertIs(put_str_ln, index.enclosing_leaf((4, 15), (4, 15)))
+
+    def test_forgotten_with_file(self):
+        cache = ExpTypesCache()
+        cache.add(span('src/Main.hs', 4), 1, put_str_ln, leaf=True)
+        cache.forget_files(['src/Main.hs'])
+        self.assertIsNone(cache.lookup(dict(span('src/Main.hs', 4), spanFromColumn=15, spanToColumn=15), 1))
+
+    def test_innermost_expression_is_not_a_leaf(self):
+        index = SpanIndex()
+        index.add(show[1:])
+        self.assertIsNone(index.enclosing_leaf((4, 24), (4, 24)))
+
+
+# The line the spans above are in
+text = 'module Main where\n\nmain :: IO ()\nmain = do   putStrLn (show xs)\n'
+
+def exp_types_response(type_spans):
+    return {'contents': [[type, {'spanFilePath': span.filePath,
+                                 'spanFromLine': span.fromLine, 'spanFromColumn': span.fromColumn,
+                                 'spanToLine': span.toLine, 'spanToColumn': span.toColumn}]
+                         for (type, span) in type_spans]}
+
+
+@patch('stack_ide.stack_ide_loadtargets', return_value=[])
+class ExpTypesLookupTests(unittest.TestCase):
+
+    def setUp(self):
+        StackIDEManager.ide_backend_instances = {}
+
+    def lookup(self, instance, view, column, response):
+        """
+        The types shown for the cursor at the column of line 4, and whether stack-ide was asked
+        """
+        instance._backend.responses = {'RequestGetExpTypes': exp_types_response(response)}
+        instance._backend.send_request = Mock(wraps=instance._backend.send_request)
+        on_types = Mock()
+        instance.get_exp_types(dict(span('src/Main.hs', 4), spanFromColumn=column, spanToColumn=column), on_types, view)
+        return ([type for (type, _) in on_types.call_args[0][0]], instance._backend.send_request.called)
+
+    def test_cursor_on_parenthesis_then_identifier(self, loadtargets_mock):
+        (window, view) = default_mock_window()
+        view.substr = Mock(side_effect=lambda region: text[region.begin():region.end()])
+        setup_fake_backend(window)
+        instance = StackIDEManager.for_window(window)
+
+        # On `(`, the innermost span is `(show xs)`, which encloses `show`
+        self.assertEqual((['String', 'IO ()', 'IO ()'], True), self.lookup(instance, view, 22, show[1:]))
+        self.assertEqual((['Int -> String', 'String', 'IO ()', 'IO ()'], True), self.lookup(instance, view, 24, show))
+        # Whereas `show` is an identifier, so the rest of it is answered locally
+        self.assertEqual((['Int -> String', 'String', 'IO ()', 'IO ()'], False), self.lookup(instance, view, 26, show))
@@ -1,13 +1,14 @@
 import unittest
-from unittest.mock import Mock, ANY
-from event_listeners import StackIDESaveListener, StackIDETypeAtCursorHandler, StackIDEAutocompleteHandler
+from unittest.mock import Mock, ANY, patch
+from event_listeners import StackIDESaveListener, StackIDETypeAtCursorHandler, StackIDEAutocompleteHandler, StackIDEWindowListener
 from req import Req
 from .stubs import sublime
-from .mocks import default_mock_window, setup_fake_backend, setup_mock_backend
+from .mocks import default_mock_window, mock_window, mock_view, cur_dir, setup_fake_backend, setup_mock_backend
 from settings import Settings
+from stack_ide_manager import StackIDEManager
 import stack_ide
 import utility as util
-from .data import many_completions
+from .data import many_completions, status_progress_done
 
 test_settings = Settings("none", [], False)
 type_info = "FilePath -> IO String"
@@ -60,6 +61,61 @@ class ListenerTests(unittest.TestCase):
         view.set_status.assert_called_with("type_at_cursor", type_info)
         view.add_regions.assert_called_with("type_at_cursor", ANY, "storage.type", "", sublime.DRAW_OUTLINED)
 
+    def test_type_at_cursor_answered_from_cache(self):
+        listener = StackIDETypeAtCursorHandler()
+        (window, view) = default_mock_window()
+        backend = setup_fake_backend(window, {'RequestGetExpTypes': exp_types_response})
+        backend.send_request = Mock(side_effect=backend.send_request)
+        sent = lambda: [call[0][0]['tag'] for call in backend.send_request.call_args_list]
+
+        listener.on_selection_modified(view)
+        self.assertEqual(['RequestGetExpTypes'], sent())
+        view.set_status.reset_mock()
+
+        # The second lookup is shown without asking stack-ide
+        listener.on_selection_modified(view)
+        self.assertEqual(['RequestGetExpTypes'], sent())
+        view.set_status.assert_called_once_with("type_at_cursor", type_info)
+
+        # Saving the file makes us ask again
+        StackIDEManager.for_window(window).update_files(['src/Main.hs'])
+        backend.send_request.reset_mock()
+        listener.on_selection_modified(view)
+        self.assertEqual(['RequestGetExpTypes'], sent())
+
+    def test_type_at_cursor_debounced(self):
+        listener = StackIDETypeAtCursorHandler()
+        (window, view) = default_mock_window()
+        backend = setup_mock_backend(window)
+        backend.send_request.reset_mock()
+
+        scheduled = []
+        with patch.object(sublime, 'set_timeout', side_effect=lambda fn, delay: scheduled.append(fn)):
+            listener.on_selection_modified(view)
+            listener.on_selection_modified(view)
+            listener.on_selection_modified(view)
+
+        # only the latest cursor position is requested
+        for fn in scheduled:
+            fn()
+        self.assertEqual(1, backend.send_request.call_count)
+
+    def test_type_at_cursor_drops_stale_response(self):
+        listener = StackIDETypeAtCursorHandler()
+        (window, view) = default_mock_window()
+        backend = setup_mock_backend(window)
+
+        listener.on_selection_modified(view)
+        req = backend.send_request.call_args[0][0]
+
+        # the cursor moves on before the response arrives
+        with patch.object(sublime, 'set_timeout'):
+            listener.on_selection_modified(view)
+
+        StackIDEManager.for_window(window).handle_response(
+            {'seq': req['seq'], 'contents': exp_types_response['contents']})
+        view.set_status.assert_not_called()
+
     def test_request_completions(self):
 
         listener = StackIDEAutocompleteHandler()
@@ -89,3 +145,87 @@ class ListenerTests(unittest.TestCase):
         view.run_command.assert_any_call('hide_auto_complete')
         view.run_command.assert_any_call('auto_complete', ANY)
 
+
+    def test_narrowed_completions_answered_from_cache(self):
+        listener = StackIDEAutocompleteHandler()
+        (window, view) = default_mock_window()
+        view.settings().get = Mock(return_value=False)
+        backend = setup_fake_backend(window, {'RequestGetAutocompletion': many_completions})
+        backend.send_request = Mock(wraps=backend.send_request)
+
+        listener.on_query_completions(view, '*', [])
+        self.assertEqual(1, backend.send_request.call_count)
+
+        listener.refreshing = False
+        completions = listener.on_query_completions(view, '**', [])
+        self.assertEqual(1, backend.send_request.call_count)
+        self.assertEqual([['**\t\tPrelude', '**']], completions)
+
+    def test_completions_requested_again_after_recompile(self):
+        listener = StackIDEAutocompleteHandler()
+        (window, view) = default_mock_window()
+        view.settings().get = Mock(return_value=False)
+        backend = setup_fake_backend(window, {'RequestGetAutocompletion': many_completions})
+        backend.send_request = Mock(wraps=backend.send_request)
+
+        listener.on_query_completions(view, '*', [])
+        StackIDEManager.for_window(window).handle_response(status_progress_done)
+        listener.refreshing = False
+        listener.on_query_completions(view, '*', [])
+        self.assertEqual(2, backend.send_request.call_count)
+
+    def test_completions_cached_per_project(self):
+        listener = StackIDEAutocompleteHandler()
+        (window, view) = default_mock_window()
+        view.settings().get = Mock(return_value=False)
+        setup_fake_backend(window, {'RequestGetAutocompletion': many_completions})
+        other_window = mock_window([cur_dir + '/projects/stack_project'])
+        other_window.id = Mock(return_value=5678)
+        other_view = mock_view('src/Main.hs', other_window)
+        other_view.settings().get = Mock(return_value=False)
+        other_backend = setup_fake_backend(other_window, {'RequestGetAutocompletion': many_completions})
+        other_backend.send_request = Mock(wraps=other_backend.send_request)
+
+        listener.on_query_completions(view, '*', [])
+        listener.refreshing = False
+        listener.on_query_completions(other_view, '*', [])
+        self.assertEqual(1, other_backend.send_request.call_count)
+        del StackIDEManager.ide_backend_instances[5678]
+
+
+class WindowListenerTests(unittest.TestCase):
+
+    def tearDown(self):
+        sublime.destroy_windows()
+        StackIDEManager.check_windows()
+
+    def test_monitors_window_when_view_activated(self):
+        listener = StackIDEWindowListener()
+        (window, view) = default_mock_window()
+        sublime.add_window(window)
+
+        with patch.object(StackIDEManager, 'check_windows', wraps=StackIDEManager.check_windows) as check_windows:
+            listener.on_activated(view)
+            self.assertTrue(StackIDEManager.is_monitored(window))
+
+            # already known windows need no further checks
+            listener.on_activated(view)
+            self.assertEqual(1, check_windows.call_count)
+
+    def test_monitors_new_windows(self):
+        listener = StackIDEWindowListener()
+        window = sublime.create_window('.')
+        listener.on_new_window(window)
+        self.assertTrue(StackIDEManager.is_monitored(window))
+
+    def test_stops_instance_of_closing_window(self):
+        listener = StackIDEWindowListener()
+        (window, view) = default_mock_window()
+        sublime.add_window(window)
+        backend = setup_mock_backend(window)
+        instance = StackIDEManager.for_window(window)
+
+        listener.on_pre_close_window(window)
+
+        self.assertFalse(instance.is_alive)
+        backend.send_request.assert_called_with(Req.get_shutdown())
@@ -0,0 +1,68 @@
+import unittest
+from unittest.mock import MagicMock, Mock, patch
+from metrics import Metrics, RollingHistogram, request_kind
+from window_commands import ShowStackIdeLatencyCommand
+from stack_ide import StackIDE
+from .mocks import default_mock_window, setup_fake_backend
+
+
+class RollingHistogramTests(unittest.TestCase):
+
+    def test_percentiles(self):
+        histogram = RollingHistogram()
+        for value in range(100, 0, -1):
+            histogram.add(value)
+        self.assertEqual([51, 96, 100], histogram.percentiles(50, 95, 100))
+
+    def test_keeps_latest_samples(self):
+        histogram = RollingHistogram(size=10)
+        for value in range(100):
+            histogram.add(value)
+        self.assertEqual(100, histogram.count)
+        self.assertEqual([90], histogram.percentiles(0))
+
+    def test_empty(self):
+        self.assertEqual([None, None], RollingHistogram().percentiles(50, 99))
+
+
+class MetricsTests(unittest.TestCase):
+
+    def setUp(self):
+        Metrics.reset()
+        loadtargets_patcher = patch('stack_ide.stack_ide_loadtargets', return_value=['app/Main.hs', 'src/Lib.hs'])
+        loadtargets_patcher.start()
+        self.addCleanup(loadtargets_patcher.stop)
+
+    def test_request_kind(self):
+        self.assertEqual("GetExpTypes", request_kind("RequestGetExpTypes"))
+
+    def test_records_request_phases(self):
+        (window, view) = default_mock_window()
+        # starting up asks for (and gets) the source errors
+        setup_fake_backend(window)
+
+        for phase in ["response", "main thread", "handler", "total"]:
+            self.assertIsNotNone(Metrics.latest("GetSourceErrors", phase))
+        self.assertIn("GetSourceErrors", Metrics.report())
+
+    def test_shows_latency_in_status_bar(self):
+        (window, view) = default_mock_window()
+        with patch.object(StackIDE, 'show_latency', True):
+            setup_fake_backend(window)
+        self.assertEqual("stack_ide_latency", view.set_status.call_args[0][0])
+        self.assertRegex(view.set_status.call_args[0][1], r"GetSourceErrors: \d+ ms")
+
+    def test_show_latency_command(self):
+        (window, view) = default_mock_window()
+        setup_fake_backend(window)
+        panel = MagicMock()
+        window.create_output_panel = Mock(return_value=panel)
+
+        cmd = ShowStackIdeLatencyCommand()
+        cmd.window = window
+        cmd.run()
+
+        report = panel.run_command.call_args[0][1]["characters"]
+        self.assertRegex(report, "GetSourceErrors +total")
+        self.assertRegex(report, "Awaiting responses: 0")
+        window.run_command.assert_called_with("show_panel", {"panel": "output.stack_ide_latency"})
@@ -0,0 +1,161 @@
+import unittest
+from unittest.mock import Mock, ANY, patch
+from prefetch import identifier_positions, ModuleSymbols, SpanInfoTable, Prefetcher
+from response import SourceSpan
+from stack_ide import StackIDE, PendingRequest
+from stack_ide_manager import StackIDEManager
+from text_commands import ShowHsInfoAtCursorCommand
+from .data import someFunc_span_info, status_progress_done
+from .mocks import default_mock_window, setup_fake_backend
+from .stubs import sublime
+
+def info(name, line, from_column, to_column):
+    return ((name, None), SourceSpan('src/Main.hs', line, from_column, line, to_column))
+
+
+class IdentifierPositionsTests(unittest.TestCase):
+
+    def test_finds_identifiers_nearest_first(self):
+        text = 'main :: IO ()\nmain = do\n  putStrLn hello\n'
+        self.assertEqual([(2, 1), (1, 1), (1, 9), (3, 3), (3, 12)], identifier_positions(text, near_row=1))
+
+    def test_skips_strings_and_comments(self):
+        text = 'main = do -- says hello\n  putStrLn "hello"\n'
+        skipped = [sublime.Region(text.index('--'), text.index('\n')),
+                   sublime.Region(text.index('"'), text.rindex('"') + 1)]
+        self.assertEqual([(1, 1), (2, 3)], identifier_positions(text, skipped=skipped))
+
+    def test_skips_keywords(self):
+        self.assertEqual([(1, 8)], identifier_positions('module Main where'))
+
+
+class SpanInfoTableTests(unittest.TestCase):
+
+    def test_finds_identifier_around_position(self):
+        symbols = ModuleSymbols(1)
+        put_str_ln = info('putStrLn', 5, 3, 11)
+        symbols.add(info('main', 4, 1, 5))
+        symbols.add(put_str_ln)
+        self.assertIs(put_str_ln, symbols.at(5, 3))
+        self.assertIs(put_str_ln, symbols.at(5, 10))
+        self.assertIsNone(symbols.at(5, 12))
+        self.assertIsNone(symbols.at(1, 1))
+
+    def test_forgets_old_generations_and_saved_files(self):
+        table = SpanInfoTable()
+        table.add('src/Main.hs', 1, [info('main', 4, 1, 5)])
+        self.assertIsNotNone(table.lookup('src/Main.hs', 1, 4, 2))
+        self.assertIsNone(table.lookup('src/Main.hs', 2, 4, 2))
+        table.forget_files(['src/Main.hs'])
+        self.assertIsNone(table.lookup('src/Main.hs', 1, 4, 2))
+
+
+@patch('stack_ide.stack_ide_loadtargets', return_value=[])
+class PrefetcherTests(unittest.TestCase):
+
+    def setUp(self):
+        StackIDEManager.ide_backend_instances = {}
+
+    def tearDown(self):
+        StackIDE.prefetch_span_info = False
+
+    def compiled_instance(self, window):
+        setup_fake_backend(window, {'RequestGetSpanInfo': someFunc_span_info})
+        instance = StackIDEManager.for_window(window)
+        instance.handle_response(status_progress_done)
+        return instance
+
+    def prefetching_view(self, window, view):
+        """
+        The view, with its string scoped as one, compiled, and with prefetching
+        turned on and requests counted from then on
+        """
+        text = view.substr(sublime.Region(0, view.size()))
+        view.find_by_selector = Mock(return_value=[sublime.Region(text.index('"'), text.rindex('"') + 1)])
+        instance = self.compiled_instance(window)
+        instance._backend.send_request = Mock(wraps=instance._backend.send_request)
+        StackIDE.prefetch_span_info = True
+        return instance
+
+    def sent(self, instance):
+        return [call[0][0] for call in instance._backend.send_request.call_args_list]
+
+    def test_prefetches_every_identifier_once_compiled(self, loadtargets_mock):
+        (window, view) = default_mock_window()
+        instance = self.prefetching_view(window, view)
+
+        instance.prefetch(view)
+
+        requests = self.sent(instance)
+        # Not `hello` and `world`, in the string
+        self.assertEqual(['RequestGetSpanInfo'] * 5, [request['tag'] for request in requests])
+        self.assertEqual((1, 8), (requests[0]['contents']['spanFromLine'], requests[0]['contents']['spanFromColumn']))
+        self.assertEqual({}, instance.conts)
+
+    def test_resumes_when_view_activated_again(self, loadtargets_mock):
+        (window, view) = default_mock_window()
+        instance = self.prefetching_view(window, view)
+
+        with patch.object(Prefetcher, 'max_requests', 2):
+            instance.prefetch(view)
+        self.assertEqual(2, len(self.sent(instance)))
+
+        # Focus coming back goes on with the rest, without asking again
+        instance.prefetch(view)
+        self.assertEqual(5, len(self.sent(instance)))
+        instance.prefetch(view)
+        self.assertEqual(5, len(self.sent(instance)))
+
+        # Until the session recompiles
+        instance.handle_response(status_progress_done)
+        self.assertEqual(10, len(self.sent(instance)))
+
+    def test_orphaned_request_doesnt_hold_up_prefetching(self, loadtargets_mock):
+        (window, view) = default_mock_window()
+        instance = self.prefetching_view(window, view)
+        orphan = PendingRequest('orphan', 'RequestGetSourceErrors', Mock())
+        instance.conts[orphan.seq_id] = orphan
+
+        instance.prefetch(view)
+        self.assertEqual(5, len(self.sent(instance)))
+
+    def test_waits_for_interactive_requests(self, loadtargets_mock):
+        (window, view) = default_mock_window()
+        instance = self.prefetching_view(window, view)
+        live = PendingRequest('live', 'RequestGetExpTypes', Mock(), view.id())
+        instance.conts[live.seq_id] = live
+        instance.latest_requests[live.group] = live
+
+        with patch.object(sublime, 'set_timeout') as set_timeout:
+            instance.prefetch(view)
+            instance.prefetcher._next()
+            self.assertEqual([], self.sent(instance))
+            set_timeout.assert_called_with(ANY, Prefetcher.busy_interval)
+
+            # Until it is long overdue
+            live.sent_at -= Prefetcher.busy_timeout
+            instance.prefetcher._next()
+            self.assertEqual(1, len(self.sent(instance)))
+
+    def test_disabled_by_default(self, loadtargets_mock):
+        (window, view) = default_mock_window()
+        instance = self.compiled_instance(window)
+        instance._backend.send_request = Mock()
+        instance.prefetch(view)
+        instance._backend.send_request.assert_not_called()
+
+    def test_info_at_cursor_answered_from_table(self, loadtargets_mock):
+        (window, view) = default_mock_window()
+        instance = self.compiled_instance(window)
+        instance.get_span_info({'spanFilePath': 'app/Main.hs', 'spanFromLine': 7, 'spanFromColumn': 27,
+                                'spanToLine': 7, 'spanToColumn': 27}, Mock())
+        instance._backend.send_request = Mock()
+        view.rowcol = Mock(return_value=(6, 29))
+        view.file_name = Mock(return_value=window.folders()[0] + '/app/Main.hs')
+
+        cmd = ShowHsInfoAtCursorCommand()
+        cmd.view = view
+        cmd.run(None)
+
+        instance._backend.send_request.assert_not_called()
+        view.show_popup.assert_called_with("someFunc :: IO ()  (Defined in src/Lib.hs:9:1)")
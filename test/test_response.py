@@ -1,6 +1,8 @@
+import json
 import unittest
+from unittest.mock import patch
 import response as res
-from .data import source_errors, status_progress_1, status_progress_2, status_progress_done, status_progress_restart, many_completions, readFile_exp_types
+from .data import source_errors, status_progress_1, status_progress_2, status_progress_done, status_progress_restart, many_completions, readFile_exp_types, someFunc_span_info
 
 class ParsingTests(unittest.TestCase):
 
@@ -47,6 +49,44 @@ class ParsingTests(unittest.TestCase):
         self.assertEqual(None, prop.type)
         self.assertEqual('Data.List', scope.importedFrom.module)
 
+    def test_idprop_package_and_module(self):
+        (prop, _) = list(res.parse_autocompletions(many_completions['contents']))[0]
+        self.assertEqual('GHC.List', prop.module)
+        self.assertEqual('base', prop.package)
+        ((prop, _), _) = list(res.parse_span_info_response(someFunc_span_info['contents']))[0]
+        self.assertEqual('Lib', prop.module)
+        self.assertEqual('main', prop.package)
+
+    def test_definition_span_parsed_when_needed(self):
+        span = {'spanFilePath': 'src/Lib.hs', 'spanFromLine': 3, 'spanFromColumn': 1, 'spanToLine': 3, 'spanToColumn': 9}
+        prop = res.IdProp('Lib', 'main', None, 'someFunc', None, {'tag': 'ProperSpan', 'contents': span})
+        self.assertEqual('src/Lib.hs', prop.defSpan.filePath)
+        self.assertIs(prop.defSpan, prop.defSpan)
+        self.assertIsNone(res.IdProp('Lib', 'main', None, 'someFunc', None, {'tag': 'TextSpan', 'contents': ''}).defSpan)
+
+    def test_completions_share_names_and_scopes(self):
+        # Decode twice, so the two responses have separate copies of each string
+        contents = json.loads(json.dumps(many_completions.get('contents')))
+        again = json.loads(json.dumps(many_completions.get('contents')))
+        names = res.NameTable()
+        (prop, scope) = list(res.parse_autocompletions(contents, names))[0]
+        (prop_again, scope_again) = list(res.parse_autocompletions(again, names))[0]
+
+        self.assertIs(prop.module, prop_again.module)
+        self.assertIs(prop.package, prop_again.package)
+        self.assertIs(scope, scope_again)
+
+        (_, scope_other) = list(res.parse_autocompletions(contents, res.NameTable()))[0]
+        self.assertIsNot(scope, scope_other)
+
+    @patch.object(res.NameTable, 'max_size', 2)
+    def test_name_table_starts_afresh_when_full(self):
+        table = res.NameTable()
+        for name in ['Prelude', 'Data.List', 'Data.Maybe']:
+            table.name(name)
+        self.assertEqual(['Data.Maybe'], list(table.names))
+        self.assertIsNone(table.name(None))
+
     def test_parse_update_session(self):
 
         self.assertEqual('Starting session...', res.parse_update_session(status_progress_restart.get('contents')))
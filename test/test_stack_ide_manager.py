@@ -1,11 +1,11 @@
 import unittest
-from unittest.mock import MagicMock, Mock
+from unittest.mock import MagicMock, Mock, ANY, patch
 from stack_ide_manager import NoStackIDE, StackIDEManager, configure_instance
 import stack_ide
 from .mocks import mock_window, cur_dir
 from .stubs import sublime
 from .fakebackend import FakeBackend
-from .data import test_settings
+from .data import test_settings, status_progress_done
 from log import Log
 from req import Req
 import watchdog as wd
@@ -21,9 +21,12 @@ class WatchdogTests(unittest.TestCase):
 
         self.assertIsNotNone(wd.watchdog)
 
+        watchdog = wd.watchdog
         wd.plugin_unloaded()
 
         self.assertIsNone(wd.watchdog)
+        watchdog.thread.join(5)
+        self.assertFalse(watchdog.thread.is_alive())
 
 
 class StackIDEManagerTests(unittest.TestCase):
@@ -110,6 +113,27 @@ class StackIDEManagerTests(unittest.TestCase):
         self.assertEqual(1, len(StackIDEManager.ide_backend_instances))
         sublime.destroy_windows()
 
+    def test_close_window(self):
+        window = sublime.create_window('.')
+        StackIDEManager.check_windows()
+
+        backend = MagicMock()
+        stack_ide.stack_ide_loadtargets = Mock(return_value=['app/Main.hs', 'src/Lib.hs'])
+        instance = stack_ide.StackIDE(window, test_settings, backend)
+        StackIDEManager.ide_backend_instances[window.id()] = instance
+
+        StackIDEManager.close_window(window)
+        self.assertFalse(instance.is_alive)
+        backend.send_request.assert_called_with(Req.get_shutdown())
+
+        # the closing window doesn't get a new instance
+        StackIDEManager.check_windows()
+        self.assertIsInstance(StackIDEManager.ide_backend_instances[window.id()], NoStackIDE)
+
+        sublime.destroy_windows()
+        StackIDEManager.check_windows()
+        self.assertEqual(0, len(StackIDEManager.ide_backend_instances))
+
     def test_reset(self):
         window = mock_window(['.'])
         sublime.add_window(window)
@@ -135,6 +159,146 @@ class StackIDEManagerTests(unittest.TestCase):
 
 
 
+class ProjectWindowsTestCase(unittest.TestCase):
+    """
+    Starts (fake) instances for mock windows on the helloworld project
+    """
+
+    def setUp(self):
+        self.start_patcher = patch('stack_ide.stack_ide_start', side_effect=lambda *args: MagicMock())
+        self.start_patcher.start()
+        self.loadtargets_patcher = patch('stack_ide.stack_ide_loadtargets', return_value=['src/Main.hs'])
+        self.loadtargets_patcher.start()
+        StackIDEManager.configure(test_settings)
+
+    def tearDown(self):
+        self.start_patcher.stop()
+        self.loadtargets_patcher.stop()
+        sublime.destroy_windows()
+        StackIDEManager.check_windows()
+        StackIDEManager.configure(None)
+
+    def project_window(self, window_id):
+        window = mock_window([cur_dir + '/projects/helloworld'])
+        window.id = Mock(return_value=window_id)
+        sublime.add_window(window)
+        return window
+
+
+class BackendPoolTests(ProjectWindowsTestCase):
+
+    def test_windows_on_same_project_share_instance(self):
+        first = self.project_window(1)
+        second = self.project_window(2)
+        StackIDEManager.check_windows()
+
+        instance = StackIDEManager.for_window(first)
+        self.assertIsInstance(instance, stack_ide.StackIDE)
+        self.assertIs(instance, StackIDEManager.for_window(second))
+        self.assertEqual([first, second], instance.windows)
+        stack_ide.stack_ide_start.assert_called_once_with(cur_dir + '/projects/helloworld', 'helloworld', ANY)
+
+    def test_instance_ends_with_last_window(self):
+        first = self.project_window(1)
+        second = self.project_window(2)
+        StackIDEManager.check_windows()
+        instance = StackIDEManager.for_window(first)
+
+        StackIDEManager.close_window(first)
+        self.assertTrue(instance.is_alive)
+        self.assertEqual([second], instance.windows)
+
+        StackIDEManager.close_window(second)
+        self.assertFalse(instance.is_alive)
+        self.assertEqual({}, StackIDEManager.backend_pool)
+
+    def test_source_errors_shown_in_all_windows(self):
+        first = self.project_window(1)
+        second = self.project_window(2)
+        StackIDEManager.check_windows()
+        instance = StackIDEManager.for_window(first)
+
+        with patch('stack_ide.Win') as win:
+            instance._handle_source_errors([])
+        win.assert_any_call(first)
+        win.assert_any_call(second)
+
+
+class RestartTests(ProjectWindowsTestCase):
+
+    def test_old_instance_serves_until_replacement_ready(self):
+        window = self.project_window(1)
+        StackIDEManager.check_windows()
+        instance = StackIDEManager.for_window(window)
+
+        StackIDEManager.restart()
+
+        standby = StackIDEManager.standby_instances[instance]
+        self.assertIsNot(instance, standby)
+        self.assertIs(instance, StackIDEManager.for_window(window))
+        self.assertTrue(instance.is_alive)
+
+        standby.handle_response(status_progress_done)
+
+        self.assertIs(standby, StackIDEManager.for_window(window))
+        self.assertIs(standby, StackIDEManager.shared_instance(instance.project_path))
+        self.assertEqual([window], standby.windows)
+        self.assertFalse(instance.is_alive)
+        self.assertEqual({}, StackIDEManager.standby_instances)
+
+    def test_replacement_shows_errors_only_once_swapped(self):
+        window = self.project_window(1)
+        StackIDEManager.check_windows()
+        instance = StackIDEManager.for_window(window)
+
+        StackIDEManager.restart()
+        standby = StackIDEManager.standby_instances[instance]
+        self.assertEqual([], standby.windows)
+
+        with patch('stack_ide.Win') as win:
+            standby._handle_source_errors([])
+            win.assert_not_called()
+            standby.handle_response(status_progress_done)
+        self.assertEqual([window], standby.windows)
+        standby._backend.send_request.assert_called_with(dict(Req.get_source_errors(), seq=ANY))
+
+    def test_replacement_started_for_open_window(self):
+        first = self.project_window(1)
+        second = self.project_window(2)
+        StackIDEManager.check_windows()
+        instance = StackIDEManager.for_window(first)
+        StackIDEManager.close_window(first)
+
+        StackIDEManager.restart()
+
+        self.assertIs(second, instance.window)
+        self.assertIs(second, StackIDEManager.standby_instances[instance].window)
+
+    def test_replacement_dropped_when_windows_close(self):
+        window = self.project_window(1)
+        StackIDEManager.check_windows()
+        instance = StackIDEManager.for_window(window)
+
+        StackIDEManager.restart()
+        standby = StackIDEManager.standby_instances[instance]
+        StackIDEManager.close_window(window)
+
+        self.assertFalse(instance.is_alive)
+        self.assertFalse(standby.is_alive)
+        self.assertEqual({}, StackIDEManager.standby_instances)
+
+    def test_restarts_failed_windows_straight_away(self):
+        window = mock_window(['.'])
+        sublime.add_window(window)
+        StackIDEManager.check_windows()
+        failed = StackIDEManager.ide_backend_instances[window.id()]
+
+        StackIDEManager.restart()
+
+        self.assertIsNot(failed, StackIDEManager.ide_backend_instances[window.id()])
+        self.assertEqual({}, StackIDEManager.standby_instances)
+
+
 class LaunchTests(unittest.TestCase):
 
     # launching Stack IDE is a function that should result in a
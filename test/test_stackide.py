@@ -1,3 +1,8 @@
+import io
+import os
+import json
+import threading
+import tempfile
 import unittest
 from unittest.mock import Mock, MagicMock, patch
 import stack_ide as stackide
@@ -39,6 +44,109 @@ class StackIDETests(unittest.TestCase):
         instance.send_request(req)
         backend.send_request.assert_called_with(req)
 
+    def test_source_errors_prepared_before_main_thread(self, loadtargets_mock):
+        backend = MagicMock()
+        instance = stackide.StackIDE(mock_window([cur_dir + '/projects/helloworld/']), test_settings, backend)
+        handler = Mock()
+        pending = instance.send_request(Req.get_source_errors(), handler, prepare=stackide.ErrorReport)
+
+        with patch('stack_ide.sublime.set_timeout_async') as set_timeout_async:
+            instance.handle_response({'seq': pending.seq_id, 'contents': []})
+        handler.assert_not_called()
+
+        # Then the worker thread prepares the report and hands it on
+        set_timeout_async.call_args[0][0]()
+        self.assertIsInstance(handler.call_args[0][0], stackide.ErrorReport)
+
+    def test_failed_prepare_is_logged(self, loadtargets_mock):
+        instance = stackide.StackIDE(mock_window([cur_dir + '/projects/helloworld/']), test_settings, MagicMock())
+        handler = Mock()
+        pending = instance.send_request(Req.get_source_errors(), handler, prepare=Mock(side_effect=ValueError('bad span')))
+        with patch('stack_ide.Log.error') as log_error:
+            instance.handle_response({'seq': pending.seq_id, 'contents': []})
+        self.assertIn("bad span", str(log_error.call_args))
+        handler.assert_not_called()
+
+    def test_superseded_request_is_dropped(self, loadtargets_mock):
+        backend = MagicMock()
+        instance = stackide.StackIDE(mock_window([cur_dir + '/projects/helloworld/']), test_settings, backend)
+        view = MagicMock()
+        first_handler, second_handler = Mock(), Mock()
+
+        first = instance.send_request(Req.get_exp_types({}), first_handler, view)
+        second = instance.send_request(Req.get_exp_types({}), second_handler, view)
+        self.assertTrue(first.cancelled)
+
+        instance.handle_response({'seq': first.seq_id, 'contents': []})
+        instance.handle_response({'seq': second.seq_id, 'contents': []})
+        first_handler.assert_not_called()
+        second_handler.assert_called_with([])
+        self.assertNotIn(first.seq_id, instance.conts)
+        self.assertNotIn(second.seq_id, instance.conts)
+        self.assertEqual({}, instance.latest_requests)
+
+    def test_superseded_queued_request_is_forgotten(self, loadtargets_mock):
+        backend = MagicMock()
+        instance = stackide.StackIDE(mock_window([cur_dir + '/projects/helloworld/']), test_settings, backend)
+        view = MagicMock()
+
+        first = instance.send_request(Req.get_exp_types({}), Mock(), view)
+        backend.discard = Mock(return_value=True)
+        second = instance.send_request(Req.get_exp_types({}), Mock(), view)
+
+        backend.discard.assert_called_once_with(first.seq_id)
+        self.assertNotIn(first.seq_id, instance.conts)
+        self.assertIn(second.seq_id, instance.conts)
+
+    def test_unsent_requests_are_forgotten(self, loadtargets_mock):
+        backend = MagicMock()
+        instance = stackide.StackIDE(mock_window([cur_dir + '/projects/helloworld/']), test_settings, backend)
+
+        pending = instance.send_request(Req.get_exp_types({}), Mock(), MagicMock())
+        backend.on_dropped([pending.seq_id, 'unknown'])
+        self.assertNotIn(pending.seq_id, instance.conts)
+        self.assertEqual({}, instance.latest_requests)
+
+    def test_cancelled_request_is_dropped(self, loadtargets_mock):
+        backend = MagicMock()
+        instance = stackide.StackIDE(mock_window([cur_dir + '/projects/helloworld/']), test_settings, backend)
+        handler = Mock()
+
+        pending = instance.send_request(Req.get_source_errors(), handler)
+        pending.cancel()
+        instance.handle_response({'seq': pending.seq_id, 'contents': []})
+        handler.assert_not_called()
+        self.assertNotIn(pending.seq_id, instance.conts)
+
+    def test_expired_requests_are_swept(self, loadtargets_mock):
+        backend = MagicMock()
+        instance = stackide.StackIDE(mock_window([cur_dir + '/projects/helloworld/']), test_settings, backend)
+
+        orphan = instance.send_request(Req.get_exp_types({}), Mock(), MagicMock())
+        orphan.sent_at -= instance.request_ttl + 1
+        instance.last_sweep -= instance.request_ttl
+        current = instance.send_request(Req.get_source_errors(), Mock())
+
+        self.assertNotIn(orphan.seq_id, instance.conts)
+        self.assertIn(current.seq_id, instance.conts)
+        self.assertEqual({}, instance.latest_requests)
+
+    def test_unknown_seq_is_ignored(self, loadtargets_mock):
+        backend = MagicMock()
+        instance = stackide.StackIDE(mock_window([cur_dir + '/projects/helloworld/']), test_settings, backend)
+        pending_count = len(instance.conts)
+        instance.handle_response({'seq': 'unknown', 'contents': []})
+        self.assertEqual(pending_count, len(instance.conts))
+
+    def test_sessions_keep_their_own_names(self, loadtargets_mock):
+        window = mock_window([cur_dir + '/projects/helloworld/'])
+        instance = stackide.StackIDE(window, test_settings, MagicMock())
+        names = instance.names
+        io_type = names.name('IO ()')
+        stackide.StackIDE(window, test_settings, MagicMock(), standby=True)
+        self.assertIs(names, instance.names)
+        self.assertIs(io_type, instance.names.name('IO ()'))
+
     def test_handle_welcome_stack_ide_outdated(self, loadtargets_mock):
 
         backend = MagicMock()
@@ -73,3 +181,166 @@ class StackIDETests(unittest.TestCase):
         backend.send_request.assert_called_with(
             Req.get_shutdown())
 
+
+
+class LoadTargetsCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        cache_patcher = patch.object(sublime, 'cache_path', return_value=tempfile.mkdtemp())
+        cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
+        self.project_path = cur_dir + '/projects/helloworld'
+
+    def start_instance(self, targets):
+        backend = MagicMock()
+        with patch('stack_ide.stack_ide_loadtargets', return_value=targets) as loadtargets:
+            instance = stackide.StackIDE(mock_window([self.project_path]), test_settings, backend)
+        loadtargets.assert_called_with(self.project_path, 'helloworld')
+        return (instance, backend)
+
+    def include_requests(self, backend):
+        return [call[0][0] for call in backend.send_request.call_args_list
+                if call[0][0].get('tag') == 'RequestUpdateSession']
+
+    def test_caches_load_targets(self):
+        self.assertIsNone(stackide.read_cached_loadtargets(self.project_path, 'helloworld'))
+        self.start_instance(['src/Main.hs'])
+        self.assertEqual(['src/Main.hs'], stackide.read_cached_loadtargets(self.project_path, 'helloworld'))
+
+    def test_uses_cached_load_targets(self):
+        self.start_instance(['src/Main.hs'])
+        (instance, backend) = self.start_instance(['src/Main.hs'])
+
+        # the session is only updated once, with the cached targets
+        self.assertEqual([Req.update_session_includes(['src/Main.hs'])], self.include_requests(backend))
+
+    def test_updates_changed_load_targets(self):
+        self.start_instance(['src/Main.hs', 'src/Old.hs'])
+        (instance, backend) = self.start_instance(['src/Main.hs', 'src/New.hs'])
+
+        self.assertEqual({'src/Main.hs', 'src/New.hs'}, instance.include_targets)
+        self.assertEqual(2, len(self.include_requests(backend)))
+        self.assertEqual(['src/Main.hs', 'src/New.hs'], stackide.read_cached_loadtargets(self.project_path, 'helloworld'))
+
+    def test_keeps_cached_load_targets_when_stack_fails(self):
+        self.start_instance(['src/Main.hs'])
+        (instance, backend) = self.start_instance([])
+
+        self.assertEqual({'src/Main.hs'}, instance.include_targets)
+        self.assertEqual([Req.update_session_includes(['src/Main.hs'])], self.include_requests(backend))
+        self.assertEqual(['src/Main.hs'], stackide.read_cached_loadtargets(self.project_path, 'helloworld'))
+
+    def test_cache_keyed_by_project_files(self):
+        self.start_instance(['src/Main.hs'])
+        with patch('stack_ide.project_files_hash', return_value='changed'):
+            self.assertIsNone(stackide.read_cached_loadtargets(self.project_path, 'helloworld'))
+
+
+def fake_process(output):
+    process = MagicMock()
+    process.stdout = io.BufferedReader(io.BytesIO(output))
+    process.stderr = io.BytesIO(b'')
+    process.poll = Mock(return_value=0)
+    return process
+
+
+class JsonProcessBackendTests(unittest.TestCase):
+
+    def read_all(self, output):
+        responses = []
+        backend = stackide.JsonProcessBackend(fake_process(output), lambda data, timing: responses.append(data))
+        backend.stdoutThread.join(5)
+        backend.dispatchThread.join(5)
+        return responses
+
+    def test_reads_responses_in_order(self):
+        messages = [{'tag': 'ResponseLog', 'contents': str(i)} for i in range(100)]
+        output = b''.join(json.dumps(m).encode('UTF-8') + b'\n' for m in messages)
+        self.assertEqual(messages, self.read_all(output))
+
+    @patch.object(stackide.JsonProcessBackend, 'read_chunk_size', 7)
+    @patch.object(stackide.JsonProcessBackend, 'large_response_size', 50)
+    def test_reassembles_large_responses_in_order(self):
+        large = {'tag': 'ResponseGetAutocompletion', 'contents': ['completion'] * 100}
+        small = {'tag': 'ResponseLog', 'contents': 'ok'}
+        messages = [large, small, large, small]
+        output = b''.join(json.dumps(m).encode('UTF-8') + b'\n' for m in messages)
+        self.assertEqual(messages, self.read_all(output))
+
+    def test_skips_non_json_lines(self):
+        output = b'Welcome!\n\n{"tag": "ResponseLog", "contents": "\xc3\xa9"}'
+        self.assertEqual([{'tag': 'ResponseLog', 'contents': '\u00e9'}], self.read_all(output))
+
+
+class JsonProcessBackendWriterTests(unittest.TestCase):
+
+    def setUp(self):
+        # stdout stays open until the test is done with the backend
+        (read_fd, self.stdout_fd) = os.pipe()
+        process = fake_process(b'')
+        process.stdout = open(read_fd, 'rb')
+        self.written = []
+        self.flushed = threading.Event()
+        process.stdin.write = Mock(side_effect=self.written.append)
+        process.stdin.flush = Mock(side_effect=self.flushed.set)
+        self.backend = stackide.JsonProcessBackend(process, Mock())
+
+    def tearDown(self):
+        os.close(self.stdout_fd)
+        self.backend.stdinThread.join(5)
+        self.backend._process.stdout.close()
+
+    def requests_written(self):
+        return [json.loads(line) for chunk in self.written for line in chunk.decode('UTF-8').splitlines()]
+
+    def test_coalesces_queued_requests(self):
+        requests = [Req.update_session(), Req.get_source_errors(), Req.get_exp_types({})]
+        with self.backend._requests_ready:
+            for request in requests:
+                self.assertTrue(self.backend.send_request(request))
+
+        self.flushed.wait(5)
+
+        self.assertEqual(1, len(self.written))
+        self.assertEqual(requests, self.requests_written())
+
+    def test_discards_queued_request(self):
+        with self.backend._requests_ready:
+            for line in range(1, 4):
+                self.backend.send_request(dict(Req.get_exp_types({'spanFromLine': line}), seq=str(line)))
+            self.assertTrue(self.backend.discard('2'))
+            self.assertFalse(self.backend.discard('unknown'))
+
+        self.flushed.wait(5)
+
+        self.assertEqual(['1', '3'], [request['seq'] for request in self.requests_written()])
+        self.assertFalse(self.backend.discard('1'))
+
+    def test_survives_closed_stdin(self):
+        self.backend._process.stdin.write = Mock(side_effect=ValueError("write to closed file"))
+        self.backend.send_request(Req.get_source_errors())
+        self.backend.stdinThread.join(5)
+        self.assertFalse(self.backend.stdinThread.is_alive())
+        self.assertFalse(self.backend.send_request(Req.get_source_errors()))
+
+    @patch.object(stackide.JsonProcessBackend, 'max_queued_requests', 3)
+    def test_drops_oldest_queries_when_full(self):
+        self.backend.on_dropped = Mock()
+        with self.backend._requests_ready:
+            self.backend.send_request(dict(Req.update_session(), seq='update'))
+            for line in range(1, 4):
+                self.backend.send_request(dict(Req.get_exp_types({'spanFromLine': line}), seq=str(line)))
+
+        self.flushed.wait(5)
+
+        self.assertEqual(['update', '2', '3'], [request['seq'] for request in self.requests_written()])
+        self.backend.on_dropped.assert_called_once_with(['1'])
+
+    def test_failed_write_reports_unsent_requests(self):
+        self.backend.on_dropped = Mock()
+        self.backend._process.stdin.write = Mock(side_effect=BrokenPipeError())
+        with self.backend._requests_ready:
+            self.backend.send_request(dict(Req.get_source_errors(), seq='a'))
+            self.backend.send_request(dict(Req.get_exp_types({}), seq='b'))
+        self.backend.stdinThread.join(5)
+        self.backend.on_dropped.assert_called_once_with(['a', 'b'])
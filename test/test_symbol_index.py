@@ -0,0 +1,195 @@
+import os
+import copy
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+import response as res
+from stack_ide_manager import StackIDEManager
+from symbol_index import SymbolIndex
+from text_commands import GotoDefinitionAtCursorCommand
+from .stubs import sublime
+from .data import someFunc_span_info, many_completions, status_progress_done
+from .mocks import default_mock_window, setup_fake_backend
+
+def completion(name, module, filepath, line, column):
+    return {'idProp': {'idName': name, 'idType': None,
+                       'idDefinedIn': {'moduleName': module, 'modulePackage': {'packageName': 'main'}},
+                       'idDefSpan': {'tag': 'ProperSpan', 'contents': {
+                           'spanFilePath': filepath, 'spanFromLine': line, 'spanFromColumn': column,
+                           'spanToLine': line, 'spanToColumn': column + len(name)}}},
+            'idScope': {'tag': 'Local'}}
+
+
+class SymbolIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.project = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.project, 'src'))
+        for name in ['Lib.hs', 'Main.hs']:
+            open(os.path.join(self.project, 'src', name), 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.project)
+
+    def test_indexes_span_info_definitions(self):
+        index = SymbolIndex(self.project)
+        index.add_span_infos(res.parse_span_info_response(someFunc_span_info['contents']))
+        self.assertEqual([('Lib', 'src/Lib.hs', 9, 1)], index.find('someFunc'))
+        self.assertEqual([], index.find('putStrLn'))
+
+    def test_skips_local_bindings(self):
+        local = copy.deepcopy(someFunc_span_info['contents'])
+        local[0][0]['contents']['idScope'] = {'tag': 'Local'}
+        index = SymbolIndex(self.project)
+        index.add_span_infos(res.parse_span_info_response(local))
+        self.assertEqual([], index.symbols())
+
+    def test_replaces_stale_files_once_relearnt(self):
+        index = SymbolIndex(self.project)
+        index.add_completions([completion('greet', 'Lib', 'src/Lib.hs', 11, 1),
+                               completion('main', 'Main', 'src/Main.hs', 4, 1)])
+        index.mark_stale(['src/Lib.hs'])
+        self.assertEqual([('Lib', 'src/Lib.hs', 11, 1)], index.find('greet'))
+
+        index.add_completions([completion('hello', 'Lib', 'src/Lib.hs', 3, 1)])
+        index.add_completions([completion('world', 'Lib', 'src/Lib.hs', 5, 1)])
+        self.assertEqual([('hello', 'Lib', 'src/Lib.hs', 3, 1), ('main', 'Main', 'src/Main.hs', 4, 1),
+                          ('world', 'Lib', 'src/Lib.hs', 5, 1)], sorted(index.symbols()))
+
+    def test_renamed_module_replaces_old_name(self):
+        index = SymbolIndex(self.project)
+        index.add_completions([completion('greet', 'Lib', 'src/Lib.hs', 11, 1)])
+        index.add_completions([completion('greet', 'Greeting', 'src/Lib.hs', 11, 1)])
+        self.assertEqual([('Greeting', 'src/Lib.hs', 11, 1)], index.find('greet'))
+
+    def test_indexes_only_project_completions(self):
+        index = SymbolIndex(self.project)
+        index.add_completions(many_completions['contents'])
+        self.assertEqual([], index.symbols())
+        index.add_completions([completion('greet', 'Lib', 'src/Lib.hs', 11, 1)])
+        self.assertEqual([('greet', 'Lib', 'src/Lib.hs', 11, 1)], index.symbols())
+
+    def test_round_trips_through_disk(self):
+        os.makedirs(os.path.join(self.project, '.stack-work'))
+        index = SymbolIndex(self.project)
+        index.add_completions([completion('greet', 'Lib', 'src/Lib.hs', 11, 1),
+                               completion('main', 'Main', 'src/Main.hs', 4, 1)])
+        index.save()
+        self.assertFalse(index.dirty)
+
+        os.remove(os.path.join(self.project, 'src', 'Main.hs'))
+        loaded = SymbolIndex(self.project)
+        loaded._load()
+        self.assertEqual([('greet', 'Lib', 'src/Lib.hs', 11, 1)], loaded.symbols())
+
+    def test_leaves_unbuilt_projects_alone(self):
+        index = SymbolIndex(self.project)
+        index.add_completions([completion('greet', 'Lib', 'src/Lib.hs', 11, 1)])
+        index.save()
+        self.assertFalse(os.path.exists(os.path.join(self.project, '.stack-work')))
+
+    def test_ignores_unreadable_index(self):
+        os.makedirs(os.path.dirname(SymbolIndex(self.project).path))
+        with open(SymbolIndex(self.project).path, 'w') as f:
+            f.write('{"version": 1, "fil')
+        index = SymbolIndex(self.project)
+        index._load()
+        self.assertEqual([], index.symbols())
+
+
+@patch('stack_ide.stack_ide_loadtargets', return_value=[])
+class IndexedDefinitionTests(unittest.TestCase):
+
+    def setUp(self):
+        StackIDEManager.ide_backend_instances = {}
+        SymbolIndex.indexes = {}
+
+    def tearDown(self):
+        SymbolIndex.indexes = {}
+
+    def goto_main(self, window, view):
+        index = SymbolIndex.for_project(window.folders()[0])
+        index.add_completions([completion('main', 'Main', 'src/Main.hs', 4, 1)])
+        view.word = Mock(return_value=sublime.Region(19, 23))
+        cmd = GotoDefinitionAtCursorCommand()
+        cmd.view = view
+        cmd.run(None)
+
+    def test_goto_definition_without_stack_ide(self, loadtargets_mock):
+        (window, view) = default_mock_window()
+        self.goto_main(window, view)
+        window.open_file.assert_called_with(os.path.join(window.folders()[0], 'src/Main.hs') + ':4:1', sublime.ENCODED_POSITION)
+
+    def test_goto_definition_asks_stack_ide_once_compiled(self, loadtargets_mock):
+        (window, view) = default_mock_window()
+        setup_fake_backend(window, {'RequestGetSpanInfo': someFunc_span_info})
+        StackIDEManager.for_window(window).is_compiling = False
+        self.goto_main(window, view)
+        window.open_file.assert_called_with(os.path.join(window.folders()[0], 'src/Lib.hs') + ':9:1', sublime.ENCODED_POSITION)
+
+    def test_span_info_responses_indexed(self, loadtargets_mock):
+        (window, view) = default_mock_window()
+        setup_fake_backend(window, {'RequestGetSpanInfo': someFunc_span_info})
+        instance = StackIDEManager.for_window(window)
+        instance.handle_response(status_progress_done)
+        instance.get_span_info({}, Mock())
+        self.assertEqual([('Lib', 'src/Lib.hs', 9, 1)], SymbolIndex.for_project(window.folders()[0]).find('someFunc'))
+
+    def test_recompiled_files_indexed_again(self, loadtargets_mock):
+        (window, view) = default_mock_window()
+        setup_fake_backend(window, {'RequestGetSpanInfo': someFunc_span_info})
+        instance = StackIDEManager.for_window(window)
+        instance.handle_response(status_progress_done)
+        index = SymbolIndex.for_project(window.folders()[0])
+        index.add_completions([completion('oldName', 'Lib', 'src/Lib.hs', 5, 1)])
+
+        # Old entries answer while Lib.hs recompiles, and answers from stack-ide
+        # then may be from before it changed
+        instance.update_files(['src/Lib.hs'])
+        self.assertEqual([('Lib', 'src/Lib.hs', 5, 1)], index.find('oldName'))
+        on_infos = Mock()
+        instance.get_span_info({'spanFilePath': 'src/Lib.hs'}, on_infos)
+        self.assertEqual('someFunc', on_infos.call_args[0][0][0][0][0].name)
+        self.assertEqual([], index.find('someFunc'))
+
+        # Once compiled, what is learnt about Lib.hs replaces the old entries
+        instance.handle_response(status_progress_done)
+        instance.get_span_info({'spanFilePath': 'src/Lib.hs'}, Mock())
+        self.assertEqual([('Lib', 'src/Lib.hs', 9, 1)], index.find('someFunc'))
+        self.assertEqual([], index.find('oldName'))
+
+
+class IndexAtStartupTests(unittest.TestCase):
+
+    def setUp(self):
+        StackIDEManager.ide_backend_instances = {}
+        SymbolIndex.indexes = {}
+        self.project = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.project, 'src'))
+        open(os.path.join(self.project, 'src', 'Lib.hs'), 'w').close()
+        os.makedirs(os.path.join(self.project, '.stack-work'))
+        index = SymbolIndex(self.project)
+        index.add_completions([completion('someFunc', 'Lib', 'src/Lib.hs', 9, 1)])
+        index.save()
+
+    def tearDown(self):
+        SymbolIndex.indexes = {}
+        shutil.rmtree(self.project)
+
+    @patch('stack_ide.stack_ide_loadtargets', return_value=['src/Lib.hs'])
+    def test_initial_load_keeps_saved_index(self, loadtargets_mock):
+        window = default_mock_window()[0]
+        window.folders = Mock(return_value=[self.project])
+        setup_fake_backend(window)
+        instance = StackIDEManager.for_window(window)
+        self.assertTrue(instance.is_compiling)
+        self.assertEqual([('Lib', 'src/Lib.hs', 9, 1)], SymbolIndex.for_project(self.project).find('someFunc'))
+
+        # Learning more about Lib.hs adds to what was saved
+        instance.handle_response(status_progress_done)
+        instance.index_completions([completion('greet', 'Lib', 'src/Lib.hs', 11, 1)])
+        SymbolIndex.for_project(self.project).save()
+        SymbolIndex.indexes = {}
+        self.assertEqual([('Lib', 'src/Lib.hs', 9, 1)], SymbolIndex.for_project(self.project).find('someFunc'))
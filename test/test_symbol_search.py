@@ -0,0 +1,144 @@
+import re
+import unittest
+from unittest.mock import Mock, patch
+from symbol_index import SymbolIndex
+from symbol_search import SymbolMatcher
+from window_commands import GotoHsSymbolCommand
+from .stubs import sublime
+from .mocks import default_mock_window
+from .bench.traces import symbols
+
+def ranked(symbols, query, limit):
+    """
+    What SymbolMatcher should find, the slow way
+    """
+    query = query.lower()
+    fuzzy = re.compile('.*?'.join(re.escape(char) for char in query))
+    def tier(name):
+        name = name.lower()
+        return 0 if name.startswith(query) else 1 if query in name else 2 if fuzzy.search(name) else None
+    matching = [symbol for symbol in symbols if tier(symbol[0]) is not None]
+    return sorted(matching, key=lambda symbol: (tier(symbol[0]), len(symbol[0]), symbol[0]))[:limit]
+
+
+class SymbolMatcherTests(unittest.TestCase):
+
+    def setUp(self):
+        self.symbols = symbols(3000, modules=20)
+        self.matcher = SymbolMatcher(self.symbols)
+
+    def test_ranks_prefix_then_substring_then_fuzzy(self):
+        matcher = SymbolMatcher([('mapWithKey', 'Data.Map', 'src/Map.hs', 1, 1),
+                                 ('insertWith', 'Data.Map', 'src/Map.hs', 2, 1),
+                                 ('withMap', 'Data.Map', 'src/Map.hs', 3, 1),
+                                 ('with', 'Data.Map', 'src/Map.hs', 4, 1),
+                                 ('unrelated', 'Data.Map', 'src/Map.hs', 5, 1)])
+        self.assertEqual(['with', 'withMap', 'insertWith', 'mapWithKey'],
+                         [symbol[0] for symbol in matcher.match('With')])
+        self.assertEqual(['mapWithKey'], [symbol[0] for symbol in matcher.match('mwk')])
+
+    def test_matches_brute_force(self):
+        for query in ['p', 'pa', 'insertwith', 'pmh', 'hmp', 'ea', 'zzqx', 'lookupfrmjsn']:
+            self.assertEqual(ranked(self.symbols, query, 20), self.matcher.match(query, 20), query)
+
+    def test_matches_brute_force_when_typed(self):
+        for query in ['insertwith', 'pmh', 'lookupfrmjsn', 'rdrtyp']:
+            for end in range(1, len(query) + 1):
+                self.assertEqual(ranked(self.symbols, query[:end], 20), self.matcher.match(query[:end], 20), query[:end])
+
+    def test_matches_brute_force_scanning_names(self):
+        with patch.object(SymbolMatcher, 'max_tried', 0):
+            for query in ['p', 'ea', 'pmh', 'hmp', 'withto']:
+                self.assertEqual(ranked(self.symbols, query, 20), self.matcher.match(query, 20), query)
+
+    def test_matches_brute_force_scanning_in_bulk(self):
+        with patch.object(SymbolMatcher, 'max_tried', 0), patch.object(SymbolMatcher, 'max_scanned', 0):
+            for query in ['p', 'ea', 'pmh', 'hmp', 'withto']:
+                self.assertEqual(ranked(self.symbols, query, 20), self.matcher.match(query, 20), query)
+
+    def test_names_containing_query_twice_found_once(self):
+        named = [(name, 'Data.Map', 'src/Map.hs', line, 1) for (line, name) in enumerate(['mapmap', 'xmap', 'xmapmap', 'mpa'])]
+        for (max_tried, max_scanned) in [(0, 0), (0, 100), (100, 100)]:
+            with patch.object(SymbolMatcher, 'max_tried', max_tried), patch.object(SymbolMatcher, 'max_scanned', max_scanned):
+                self.assertEqual(['mapmap', 'xmap', 'xmapmap'], [symbol[0] for symbol in SymbolMatcher(named).match('map')])
+
+    def test_empty(self):
+        self.assertEqual([], SymbolMatcher([]).match('main'))
+
+
+class GotoSymbolTests(unittest.TestCase):
+
+    def setUp(self):
+        SymbolIndex.indexes = {}
+        SymbolMatcher.matchers = {}
+        SymbolMatcher.building = set()
+
+    def tearDown(self):
+        SymbolIndex.indexes = {}
+        SymbolMatcher.matchers = {}
+        SymbolMatcher.building = set()
+
+    def index(self, window):
+        index = SymbolIndex.for_project(window.folders()[0])
+        for (name, line) in [('someFunc', 9), ('someOtherFunc', 12), ('greet', 15)]:
+            index.add(name, 'Lib', Mock(filePath='src/Lib.hs', fromLine=line, fromColumn=1))
+        return index
+
+    def test_goes_to_only_match(self):
+        (window, view) = default_mock_window()
+        self.index(window)
+        cmd = GotoHsSymbolCommand()
+        cmd.window = window
+        cmd.run()
+        cmd._on_change('gre')
+        self.assertEqual("1 matches: Lib.greet", sublime.current_status)
+        cmd._on_done('gre')
+        window.open_file.assert_called_with(window.folders()[0] + '/src/Lib.hs:15:1', sublime.ENCODED_POSITION)
+
+    def test_offers_several_matches(self):
+        (window, view) = default_mock_window()
+        self.index(window)
+        cmd = GotoHsSymbolCommand()
+        cmd.window = window
+        cmd.run()
+        cmd._on_change('sf')
+        self.assertEqual("2 matches: Lib.someFunc, Lib.someOtherFunc", sublime.current_status)
+        cmd._on_done('sf')
+        (items, on_select) = window.show_quick_panel.call_args[0]
+        self.assertEqual([['Lib.someFunc', 'src/Lib.hs:9'], ['Lib.someOtherFunc', 'src/Lib.hs:12']], items)
+        on_select(1)
+        window.open_file.assert_called_with(window.folders()[0] + '/src/Lib.hs:12:1', sublime.ENCODED_POSITION)
+
+    def test_built_on_worker_thread(self):
+        (window, view) = default_mock_window()
+        index = self.index(window)
+        project_path = window.folders()[0]
+        with patch.object(sublime, 'set_timeout_async') as set_timeout_async:
+            self.assertIsNone(SymbolMatcher.for_project(project_path))
+            self.assertIsNone(SymbolMatcher.for_project(project_path))
+        self.assertEqual(1, set_timeout_async.call_count)
+        set_timeout_async.call_args[0][0]()
+        self.assertEqual('greet', SymbolMatcher.for_project(project_path).match('gre')[0][0])
+
+    def test_index_loaded_on_worker_thread(self):
+        (window, view) = default_mock_window()
+        cmd = GotoHsSymbolCommand()
+        cmd.window = window
+        with patch.object(sublime, 'set_timeout_async'), patch.object(SymbolIndex, '_load') as load:
+            cmd.run()
+        load.assert_not_called()
+        self.assertEqual({}, SymbolIndex.indexes)
+
+    def test_rebuilds_once_symbols_are_added(self):
+        (window, view) = default_mock_window()
+        index = self.index(window)
+        SymbolMatcher.for_project(index.project_path)
+        first = SymbolMatcher.for_project(index.project_path)
+        self.assertIs(first, SymbolMatcher.for_project(index.project_path))
+
+        index.add('main', 'Main', Mock(filePath='app/Main.hs', fromLine=5, fromColumn=1))
+        # The old matcher answers while the new one is built on the worker thread
+        with patch.object(sublime, 'set_timeout_async') as set_timeout_async:
+            self.assertIs(first, SymbolMatcher.for_project(index.project_path))
+        set_timeout_async.call_args[0][0]()
+        self.assertEqual('main', SymbolMatcher.for_project(index.project_path).match('main')[0][0])
@@ -1,7 +1,9 @@
 import unittest
+from unittest.mock import ANY
 from test.mocks import mock_view, mock_window, cur_dir
 import utility
 from .stubs import sublime
+from response import SourceSpan
 
 class UtilTests(unittest.TestCase):
 
@@ -34,3 +36,26 @@ class UtilTests(unittest.TestCase):
         utility.complain('complaint', 'waaaah 2')
         self.assertEqual(sublime.current_error, 'waaaah 2')
 
+
+
+class LineOffsetsTests(unittest.TestCase):
+
+    def setUp(self):
+        window = mock_window([cur_dir + '/projects/helloworld'])
+        self.view = mock_view('src/Main.hs', window)
+
+    def test_maps_spans_like_text_point(self):
+        # Line 3 of the mock view is "main :: IO ()", starting at offset 19
+        span = SourceSpan('src/Main.hs', 3, 1, 3, 5)
+        region = utility.view_region_from_span(self.view, span)
+        self.assertEqual((19, 23), (region.begin(), region.end()))
+        # Past the end of the text
+        self.assertEqual(self.view.size(), utility.LineOffsets.for_view(self.view).text_point(100, 0))
+
+    def test_reused_until_view_changes(self):
+        offsets = utility.LineOffsets.for_view(self.view)
+        self.assertIs(offsets, utility.LineOffsets.for_view(self.view))
+        self.view.substr.assert_called_once_with(ANY)
+
+        self.view.change_count.return_value = 1
+        self.assertIsNot(offsets, utility.LineOffsets.for_view(self.view))
@@ -1,6 +1,6 @@
 import unittest
-from unittest.mock import MagicMock, Mock, ANY
-from win import Win
+from unittest.mock import MagicMock, Mock, ANY, patch
+from win import Win, ErrorReport
 from .stubs import sublime
 from .mocks import cur_dir, default_mock_window
 from utility import relative_view_file_name
@@ -24,6 +24,10 @@ def create_source_error(filePath, kind, message):
 
 class WinTests(unittest.TestCase):
 
+    def setUp(self):
+        (window, view) = default_mock_window()
+        Win(window).forget_errors()
+
     def test_highlight_type_clear(self):
         (window, view) = default_mock_window()
 
@@ -78,9 +82,8 @@ class WinTests(unittest.TestCase):
         # panel.run_command.assert_any_call("clear_error_panel")
         panel.set_read_only.assert_any_call(False)
 
-        # panel should have received two messages
-        panel.run_command.assert_any_call("append_to_error_panel", {"message": "src/Main.hs:1:1: KindError:\n<error message here>"})
-        panel.run_command.assert_any_call("append_to_error_panel", {"message": "src/Main.hs:1:1: KindWarning:\n<warning message here>"})
+        # panel should have received both messages at once
+        panel.run_command.assert_any_call("append_to_error_panel", {"message": "src/Main.hs:1:1: KindError:\n<error message here>\n\nsrc/Main.hs:1:1: KindWarning:\n<warning message here>"})
 
         # regions added
         view.add_regions.assert_called_with("warnings", [ANY], "comment", "dot", sublime.DRAW_OUTLINED)
@@ -90,6 +93,36 @@ class WinTests(unittest.TestCase):
         window.run_command.assert_called_with("show_panel", {"panel": "output.hide_errors"})
         panel.set_read_only.assert_any_call(True)
 
+    def test_uses_regions_prepared_off_main_thread(self):
+
+        (window, view) = default_mock_window()
+        window.create_output_panel = Mock(return_value=MagicMock())
+
+        filePath = relative_view_file_name(view)
+        report = ErrorReport([create_source_error(filePath, "KindError", "<error message here>")])
+        Win(window).prepare_error_regions(report)
+        self.assertEqual({view.id(): {"errors": [ANY], "warnings": [], "change_count": 0}}, report.regions)
+
+        with patch('win.LineOffsets') as offsets:
+            Win(window).handle_source_errors(report)
+        offsets.for_view.assert_not_called()
+        view.add_regions.assert_any_call('errors', report.regions[view.id()]["errors"], 'invalid', 'dot', 2)
+
+    def test_prepared_regions_redone_after_edit(self):
+
+        (window, view) = default_mock_window()
+        window.create_output_panel = Mock(return_value=MagicMock())
+
+        filePath = relative_view_file_name(view)
+        report = ErrorReport([create_source_error(filePath, "KindError", "<error message here>")])
+        Win(window).prepare_error_regions(report)
+        view.change_count = Mock(return_value=1)
+
+        with patch('win.LineOffsets') as offsets:
+            Win(window).handle_source_errors(report)
+        offsets.for_view.assert_called_with(view)
+        view.add_regions.assert_any_call('errors', [offsets.for_view.return_value.region.return_value], 'invalid', 'dot', 2)
+
     def test_opens_views_for_errors(self):
 
         (window, view) = default_mock_window()
@@ -112,7 +145,7 @@ class WinTests(unittest.TestCase):
         # panel.run_command.assert_any_call("clear_error_panel")
         panel.set_read_only.assert_any_call(False)
 
-        # panel should have received two messages
+        # panel should have received the message
         panel.run_command.assert_any_call("append_to_error_panel", {"message": "src/Lib.hs:1:1: KindError:\n<error message here>"})
 
         # regions added
@@ -122,3 +155,64 @@ class WinTests(unittest.TestCase):
         # panel shown and locked
         window.run_command.assert_called_with("show_panel", {"panel": "output.hide_errors"})
         panel.set_read_only.assert_any_call(True)
+
+    def test_unchanged_errors_left_alone(self):
+
+        (window, view) = default_mock_window()
+        other_view = MagicMock()
+        window.views = Mock(return_value=[view, other_view])
+
+        panel = MagicMock()
+        window.create_output_panel = Mock(return_value=panel)
+
+        filePath = relative_view_file_name(view)
+        errors = [create_source_error(filePath, "KindError", "<error message here>")]
+
+        Win(window).handle_source_errors(errors)
+        view.add_regions.reset_mock()
+        other_view.add_regions.reset_mock()
+        window.create_output_panel.reset_mock()
+
+        Win(window).handle_source_errors(errors)
+
+        # neither the panel nor the views are touched
+        window.create_output_panel.assert_not_called()
+        view.add_regions.assert_not_called()
+        other_view.add_regions.assert_not_called()
+        window.run_command.assert_called_with("show_panel", {"panel": "output.hide_errors"})
+
+    def test_only_changed_views_updated(self):
+
+        (window, view) = default_mock_window()
+        other_view = MagicMock()
+        window.views = Mock(return_value=[view, other_view])
+
+        panel = MagicMock()
+        window.create_output_panel = Mock(return_value=panel)
+
+        filePath = relative_view_file_name(view)
+        Win(window).handle_source_errors([create_source_error(filePath, "KindError", "<error message here>")])
+        view.add_regions.reset_mock()
+        other_view.add_regions.reset_mock()
+
+        Win(window).handle_source_errors([])
+
+        view.add_regions.assert_any_call("errors", [], "invalid", "dot", sublime.DRAW_OUTLINED)
+        other_view.add_regions.assert_not_called()
+
+    def test_highlights_interleaved_errors_and_warnings(self):
+
+        (window, view) = default_mock_window()
+        window.create_output_panel = Mock(return_value=MagicMock())
+
+        filePath = relative_view_file_name(view)
+        errors = [create_source_error(filePath, "KindError", "<error 1>"),
+                  create_source_error(filePath, "KindWarning", "<warning>"),
+                  create_source_error(filePath, "KindError", "<error 2>")]
+
+        Win(window).handle_source_errors(errors)
+
+        # neither error is lost to the warning between them
+        view.add_regions.assert_any_call("errors", [ANY, ANY], "invalid", "dot", sublime.DRAW_OUTLINED)
+        view.add_regions.assert_any_call("warnings", [ANY], "comment", "dot", sublime.DRAW_OUTLINED)
+        window.find_open_file.assert_called_once_with(cur_dir + "/projects/helloworld/src/Main.hs")
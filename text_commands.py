@@ -6,10 +6,9 @@ except ImportError:
 import os, sys
 sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 
-from utility import span_from_view_selection, first_folder, filter_enclosing
-from req import Req
-from stack_ide_manager import send_request
-from response import parse_span_info_response, parse_exp_types
+from utility import span_from_view_selection, first_folder, filter_enclosing, open_definition, show_definitions
+from stack_ide_manager import get_exp_types, get_span_info, is_ready
+from symbol_index import SymbolIndex
 
 class ClearErrorPanelCommand(sublime_plugin.TextCommand):
     """
@@ -31,11 +30,9 @@ class ShowHsTypeAtCursorCommand(sublime_plugin.TextCommand):
     expression under the cursor and, if available, shows it as a pop-up.
     """
     def run(self,edit):
-        request = Req.get_exp_types(span_from_view_selection(self.view))
-        send_request(self.view.window(),request, self._handle_response)
+        get_exp_types(self.view.window(), span_from_view_selection(self.view), self._handle_response)
 
-    def _handle_response(self,response):
-        type_spans = list(parse_exp_types(response))
+    def _handle_response(self,type_spans):
         if type_spans:
             type_span = next(filter_enclosing(self.view, self.view.sel()[0], type_spans), None)
             if type_span is not None:
@@ -49,16 +46,14 @@ class ShowHsInfoAtCursorCommand(sublime_plugin.TextCommand):
     expression under the cursor and, if available, shows it as a pop-up.
     """
     def run(self,edit):
-        request = Req.get_exp_info(span_from_view_selection(self.view))
-        send_request(self.view.window(), request, self._handle_response)
+        get_span_info(self.view.window(), span_from_view_selection(self.view), self._show_info)
 
-    def _handle_response(self,response):
+    def _show_info(self,infos):
 
-        if len(response) < 1:
+        if len(infos) < 1:
            return
 
-        infos = parse_span_info_response(response)
-        (props, scope), span = next(infos)
+        (props, scope), span = infos[0]
 
         if not props.defSpan is None:
             source = "(Defined in {}:{}:{})".format(props.defSpan.filePath, props.defSpan.fromLine, props.defSpan.fromColumn)
@@ -73,24 +68,38 @@ class ShowHsInfoAtCursorCommand(sublime_plugin.TextCommand):
 class GotoDefinitionAtCursorCommand(sublime_plugin.TextCommand):
     """
     A goto_definition_at_cursor command that requests the info of the
-    expression under the cursor and, if available, navigates to its location
+    expression under the cursor and, if available, navigates to its location.
+    While stack-ide is down or compiling, the project's symbol index is used.
     """
     def run(self,edit):
-        request = Req.get_exp_info(span_from_view_selection(self.view))
-        send_request(self.view.window(),request, self._handle_response)
-
-    def _handle_response(self,response):
-
-        if len(response) < 1:
+        window = self.view.window()
+        if not is_ready(window) and self._goto_indexed_definition(window):
+            return
+        get_span_info(window, span_from_view_selection(self.view), self._goto_definition)
+
+    def _goto_indexed_definition(self, window):
+        """
+        Navigates to where the symbol index says the word under the cursor
+        is defined, or lets the user choose if there are several places.
+        Returns False if the index doesn't know the word.
+        """
+        folder = first_folder(window)
+        name = self.view.substr(self.view.word(self.view.sel()[0])).strip()
+        definitions = SymbolIndex.for_project(folder).find(name) if folder and name else []
+        if not definitions:
+            return False
+        show_definitions(window, [(name,) + definition for definition in definitions])
+        return True
+
+    def _goto_definition(self,infos):
+
+        if len(infos) < 1:
             return
 
-        infos = parse_span_info_response(response)
-        (props, scope), span = next(infos)
+        (props, scope), span = infos[0]
         window = self.view.window()
         if props.defSpan:
-            full_path = os.path.join(first_folder(window), props.defSpan.filePath)
-            window.open_file(
-            '{}:{}:{}'.format(full_path, props.defSpan.fromLine or 0, props.defSpan.fromColumn or 0), sublime.ENCODED_POSITION)
+            open_definition(window, props.defSpan.filePath, props.defSpan.fromLine, props.defSpan.fromColumn)
         elif scope.importedFrom:
             sublime.status_message("Cannot navigate to {}, it is imported from {}".format(props.name, scope.importedFrom.module))
         else:
@@ -102,11 +111,9 @@ class CopyHsTypeAtCursorCommand(sublime_plugin.TextCommand):
     expression under the cursor and, if available, puts it in the clipboard.
     """
     def run(self,edit):
-        request = Req.get_exp_types(span_from_view_selection(self.view))
-        send_request(self.view.window(), request, self._handle_response)
+        get_exp_types(self.view.window(), span_from_view_selection(self.view), self._handle_response)
 
-    def _handle_response(self,response):
-        types = list(parse_exp_types(response))
+    def _handle_response(self,types):
         if types:
             (type, span) = types[0] # types are ordered by relevance?
             sublime.set_clipboard(type)
@@ -1,5 +1,9 @@
 import glob
 import os
+import re
+import threading
+from collections import OrderedDict
+from itertools import accumulate
 try:
     import sublime
 except ImportError:
@@ -10,6 +14,8 @@ sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 
 from log import Log
 
+IDENTIFIER = re.compile(r"[A-Za-z_][\w']*")
+
 complaints_shown = set()
 def complain(id, text):
     """
@@ -37,6 +43,28 @@ def first_folder(window):
         Log.normal("Couldn't find a folder for stack-ide-sublime")
         return None
 
+def open_definition(window, filepath, line, column):
+    """
+    Opens the project file at the given (1-based) line and column
+    """
+    full_path = os.path.join(first_folder(window), filepath)
+    window.open_file('{}:{}:{}'.format(full_path, line or 0, column or 0), sublime.ENCODED_POSITION)
+
+def show_definitions(window, definitions):
+    """
+    Opens the one (name, module, file path, line, column) given, or lets the user choose one
+    """
+    def on_select(index):
+        if index >= 0:
+            (name, module, filepath, line, column) = definitions[index]
+            open_definition(window, filepath, line, column)
+
+    if len(definitions) == 1:
+        on_select(0)
+    else:
+        window.show_quick_panel([['{}.{}'.format(module, name), '{}:{}'.format(filepath, line)]
+                                 for (name, module, filepath, line, column) in definitions], on_select)
+
 def has_cabal_file(project_path):
     """
     Check if a cabal file exists in the project folder
@@ -70,7 +98,8 @@ def within(smaller, larger):
     return smaller.begin() >= larger.begin() and smaller.end() <= larger.end()
 
 def filter_enclosing(view, region, span_pairs):
-    return ((item, span) for item, span in span_pairs if within(region, view_region_from_span(view, span)))
+    offsets = LineOffsets.for_view(view)
+    return ((item, span) for item, span in span_pairs if within(region, offsets.region(span)))
 
 def format_type(raw_type):
     words = raw_type.replace("(", " ( ").replace(")", " ) ").replace("[", " [ ").replace("]", " ] ").replace(",", " , ").split(' ')
@@ -109,10 +138,64 @@ def view_region_from_span(view, span):
     :param SourceSpan span: The span to map to a region
     :rtype sublime.Region: The created Region
 
+    To map many spans for the same view, get its LineOffsets once instead.
+    """
+    return LineOffsets.for_view(view).region(span)
+
+
+class LineOffsets:
+    """
+    Where each line of a view starts, so that spans can be mapped to regions
+    without a view.text_point call for each. Kept for the most recently used
+    views until they change.
+    """
+
+    max_views = 128
+
+    cache = OrderedDict() # Map from view id to LineOffsets, least recently used first
+    lock = threading.Lock() # Regions are also worked out on the worker thread
+
+    def __init__(self, view):
+        self.change_count = view.change_count()
+        text = view.substr(sublime.Region(0, view.size()))
+        self.size = len(text)
+        # Each line starts just past the newline ending the previous one
+        self.starts = [0]
+        self.starts.extend(accumulate(len(line) + 1 for line in text.split('\n')[:-1]))
+
+    @classmethod
+    def for_view(cls, view):
+        change_count = view.change_count()
+        with cls.lock:
+            offsets = cls.cache.get(view.id())
+            if offsets is None or offsets.change_count != change_count:
+                offsets = cls.cache[view.id()] = cls(view)
+            cls.cache.move_to_end(view.id())
+            while len(cls.cache) > cls.max_views:
+                cls.cache.popitem(last=False)
+        return offsets
+
+    def text_point(self, row, col):
+        """
+        Like view.text_point: the offset col characters past the start of the row
+        """
+        if row >= len(self.starts):
+            return self.size
+        return min(self.starts[row] + col, self.size)
+
+    def region(self, span):
+        return sublime.Region(
+            self.text_point(span.fromLine - 1, span.fromColumn - 1),
+            self.text_point(span.toLine - 1, span.toColumn - 1))
+
+def is_identifier_span(view, span):
+    """
+    Whether the SourceSpan covers exactly one identifier in the view,
+    like `show`, rather than an expression, like `(show x)`
     """
-    return sublime.Region(
-        view.text_point(span.fromLine - 1, span.fromColumn - 1),
-        view.text_point(span.toLine - 1, span.toColumn - 1))
+    text = view.substr(LineOffsets.for_view(view).region(span))
+    match = IDENTIFIER.match(text)
+    return match is not None and match.end() == len(text)
 
 def span_from_view_region(view, region):
     (from_line, from_col) = view.rowcol(region.begin())
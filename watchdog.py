@@ -9,6 +9,7 @@ from settings import Settings
 from log import Log
 from win import Win
 from stack_ide_manager import StackIDEManager
+from stack_ide import StackIDE
 
 
 #############################
@@ -28,6 +29,9 @@ def plugin_loaded():
     StackIDEManager.configure(settings)
     Win.show_popup = settings.show_popup
     Win.hoogle_url = settings.hoogle_url
+    StackIDE.show_latency = settings.show_latency
+    StackIDE.capture_traffic = settings.capture_traffic
+    StackIDE.prefetch_span_info = settings.prefetch_span_info
     watchdog = StackIDEWatchdog()
 
 def plugin_unloaded():
@@ -45,7 +49,11 @@ def load_settings():
         settings_obj.get('verbosity', 'normal'),
         add_to_path if isinstance(add_to_path, list) else [],
         settings_obj.get('show_popup', False),
-        settings_obj.get('hoogle_url', "http://www.stackage.org/lts/hoogle?q=")
+        settings_obj.get('hoogle_url', "http://www.stackage.org/lts/hoogle?q="),
+        settings_obj.get('type_at_cursor_delay', 100),
+        settings_obj.get('show_latency', False),
+        settings_obj.get('capture_traffic', False),
+        settings_obj.get('prefetch_span_info', False)
     )
 
 def on_settings_changed():
@@ -57,29 +65,47 @@ def on_settings_changed():
     elif updated_settings.add_to_PATH != settings.add_to_PATH:
         Log.normal("Settings changed, reloading backends")
         StackIDEManager.configure(updated_settings)
-        StackIDEManager.reset()
+        StackIDEManager.restart()
     elif updated_settings.show_popup != settings.show_popup:
         Win.show_popup = updated_settings.show_popup
     elif updated_settings.hoogle_url != settings.hoogle_url:
         Win.hoogle_url = updated_settings.hoogle_url
+    elif updated_settings.type_at_cursor_delay != settings.type_at_cursor_delay:
+        StackIDEManager.configure(updated_settings)
+    elif updated_settings.show_latency != settings.show_latency:
+        StackIDE.show_latency = updated_settings.show_latency
+    elif updated_settings.capture_traffic != settings.capture_traffic:
+        StackIDE.capture_traffic = updated_settings.capture_traffic
+    elif updated_settings.prefetch_span_info != settings.prefetch_span_info:
+        StackIDE.prefetch_span_info = updated_settings.prefetch_span_info
 
     settings = updated_settings
 
 class StackIDEWatchdog():
     """
-    Since I can't find any way to detect if a window closes,
-    we use a watchdog timer to clean up stack-ide instances
-    once we see that the window is no longer in existence.
+    Windows opening and closing are normally noticed by StackIDEWindowListener.
+    Sublime Text 3 has no window close event though, so we still sweep for
+    closed windows every `sweep_interval` seconds, from one long-lived thread.
     """
+
+    sweep_interval = 10.0
+
     def __init__(self):
         super(StackIDEWatchdog, self).__init__()
         Log.normal("Starting stack-ide-sublime watchdog")
+        self.stopped = threading.Event()
         self.check_for_processes()
+        self.thread = threading.Thread(target=self.sweep)
+        self.thread.daemon = True
+        self.thread.start()
 
     def check_for_processes(self):
         StackIDEManager.check_windows()
-        self.timer = threading.Timer(1.0, self.check_for_processes)
-        self.timer.start()
+
+    def sweep(self):
+        while not self.stopped.wait(self.sweep_interval):
+            # check_windows must not run concurrently with the window listener
+            sublime.set_timeout(self.check_for_processes, 0)
 
     def kill(self):
-        self.timer.cancel()
+        self.stopped.set()
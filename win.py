@@ -1,12 +1,11 @@
-from itertools import groupby
 import os
 
 try:
     import sublime
 except ImportError:
     from test.stubs import sublime
-from utility import first_folder, view_region_from_span, filter_enclosing, format_type
-from response import parse_source_errors, parse_exp_types
+from utility import first_folder, view_region_from_span, filter_enclosing, format_type, relative_view_file_name, LineOffsets
+from response import parse_source_errors
 import webbrowser
 
 class Win:
@@ -16,6 +15,10 @@ class Win:
 
     show_popup = False
 
+    # What we last showed for each window, so unchanged errors are left alone
+    error_panel_texts = {} # Map from window id to the error panel's text
+    error_signatures = {} # Map from window id to a map from view id to the errors highlighted in it
+
     def __init__(self,window):
         self.window = window
 
@@ -35,13 +38,12 @@ class Win:
         full_path = os.path.join(first_folder(self.window), relative_path)
         self.window.open_file(full_path)
 
-    def highlight_type(self, exp_types):
+    def highlight_type(self, type_spans):
         """
-        ide-backend gives us a wealth of type info for the cursor. We only use the first,
-        most specific one for now, but it gives us the types all the way out to the topmost
-        expression.
+        ide-backend gives us a wealth of type info for the cursor, as (type, SourceSpan)
+        pairs. We only use the first, most specific one for now, but it gives us the types
+        all the way out to the topmost expression.
         """
-        type_spans = list(parse_exp_types(exp_types))
         if type_spans:
             view = self.window.active_view()
             type_span = next(filter_enclosing(view, view.sel()[0], type_spans), None)
@@ -61,39 +63,62 @@ class Win:
 
     def handle_source_errors(self, source_errors):
         """
-        Makes sure views containing errors are open and shows error messages + highlighting
+        Makes sure views containing errors are open and shows error messages + highlighting.
+        Takes a ResponseGetSourceErrors' contents or an ErrorReport prepared from them.
         """
+        report = source_errors if isinstance(source_errors, ErrorReport) else ErrorReport(source_errors)
+        errors = report.errors
 
-        errors = list(parse_source_errors(source_errors))
-
-        # TODO: we should pass the errorKind too if the error has no span
-        error_panel = self.reset_error_panel()
-        for error in errors:
-            error_panel.run_command("append_to_error_panel", {"message": repr(error)})
+        panel_text = report.panel_text
+        if panel_text != Win.error_panel_texts.get(self.window.id()):
+            Win.error_panel_texts[self.window.id()] = panel_text
+            error_panel = self.reset_error_panel()
+            if errors:
+                error_panel.run_command("append_to_error_panel", {"message": panel_text})
+            error_panel.set_read_only(True)
 
         if errors:
             self.show_error_panel()
         else:
             self.hide_error_panel()
 
-        error_panel.set_read_only(True)
-
-        file_errors = list(filter(lambda error: error.span, errors))
+        file_errors = report.file_errors
         # First, make sure we have views open for each error
         need_load_wait = False
+        view_by_path = {}
         paths = set(error.span.filePath for error in file_errors)
         for path in paths:
             view = self.find_view_for_path(path)
-            if not view:
+            if view:
+                view_by_path[path] = view
+            else:
                 need_load_wait = True
                 self.open_view_for_path(path)
 
         # If any error-holding files need to be opened, wait briefly to
         # make sure the file is loaded before trying to annotate it
         if need_load_wait:
-            sublime.set_timeout(lambda: self.highlight_errors(file_errors), 100)
+            sublime.set_timeout(lambda: self.highlight_errors(file_errors, view_by_path, report.regions), 100)
         else:
-            self.highlight_errors(file_errors)
+            self.highlight_errors(file_errors, view_by_path, report.regions)
+
+    def prepare_error_regions(self, report):
+        """
+        Works out, off the main thread, the regions to highlight for a report
+        in the views of this window that are already open
+        """
+        errors_by_path = {}
+        for error in report.file_errors:
+            errors_by_path.setdefault(error.span.filePath, []).append(error)
+
+        for path, errors in errors_by_path.items():
+            view = self.find_view_for_path(path)
+            if view:
+                offsets = LineOffsets.for_view(view)
+                regions = {"errors": [], "warnings": [], "change_count": view.change_count()}
+                for error in errors:
+                    regions[region_key(error)].append(offsets.region(error.span))
+                report.regions[view.id()] = regions
 
 
     def reset_error_panel(self):
@@ -119,30 +144,101 @@ class Win:
         # TODO store the panel somewhere so we can reuse it.
         return panel
 
+    def forget_errors(self):
+        """
+        Drops what we remember about the errors shown in the window
+        """
+        Win.error_panel_texts.pop(self.window.id(), None)
+        Win.error_signatures.pop(self.window.id(), None)
+
     def hide_error_panel(self):
         self.window.run_command("hide_panel", {"panel": "output.hide_errors"})
 
     def show_error_panel(self):
         self.window.run_command("show_panel", {"panel":"output.hide_errors"})
 
-    def highlight_errors(self, errors):
+    def highlight_errors(self, errors, view_by_path=None, prepared_regions=None):
         """
-        Highlights the relevant regions for each error in open views
+        Highlights the relevant regions for each error in open views.
+        Views already known to hold the errors' files can be passed in by path,
+        and regions already worked out for them by view id, which are
+        worked out again for views edited since.
         """
 
-        # We gather each error by the file view it should annotate
+        # Only views whose errors changed since the last report get their regions replaced
+        signatures_by_path = {}
+        for error in errors:
+            signatures_by_path.setdefault(error.span.filePath, []).append(error_signature(error))
+
+        view_by_path = dict(view_by_path or {})
+        views_by_id = {view.id(): view for view in self.window.views()}
+        path_by_view_id = {}
+        for path in signatures_by_path:
+            view = view_by_path.get(path) or self.find_view_for_path(path)
+            if view:
+                view_by_path[path] = view
+                views_by_id[view.id()] = view
+                path_by_view_id[view.id()] = path
+
+        prepared_regions = {view_id: regions for (view_id, regions) in (prepared_regions or {}).items()
+                            if view_id in views_by_id and views_by_id[view_id].change_count() == regions["change_count"]}
+
+        shown = Win.error_signatures.setdefault(self.window.id(), {})
+        changed_views = []
+        changed_paths = set()
+        for view_id, view in views_by_id.items():
+            path = path_by_view_id.get(view_id)
+            signatures = signatures_by_path.get(path, [])
+            if shown.get(view_id) != signatures:
+                shown[view_id] = signatures
+                changed_views.append(view)
+                changed_paths.add(path)
+
+        # We gather each error by the view and kind of region it should annotate
         # so we can add regions in bulk to each view.
-        error_regions_by_view_id = {}
-        warning_regions_by_view_id = {}
-        for path, errors_by_path in groupby(errors, lambda error: error.span.filePath):
-            view = self.find_view_for_path(path)
-            for kind, errors_by_kind in groupby(errors_by_path, lambda error: error.kind):
-                if kind == 'KindWarning':
-                    warning_regions_by_view_id[view.id()] = list(view_region_from_span(view, error.span) for error in errors_by_kind)
-                else:
-                    error_regions_by_view_id[view.id()] = list(view_region_from_span(view, error.span) for error in errors_by_kind)
+        regions_by_view_id_and_key = {}
+        offsets_by_path = {}
+        for error in errors:
+            path = error.span.filePath
+            if path not in changed_paths:
+                continue
+            view = view_by_path[path]
+            if view.id() in prepared_regions:
+                continue
+            offsets = offsets_by_path.get(path)
+            if offsets is None:
+                offsets = offsets_by_path[path] = LineOffsets.for_view(view)
+            regions_by_view_id_and_key.setdefault((view.id(), region_key(error)), []).append(offsets.region(error.span))
 
         # Add error/warning regions to their respective views
-        for view in self.window.views():
-            view.add_regions("errors", error_regions_by_view_id.get(view.id(), []), "invalid", "dot", sublime.DRAW_OUTLINED)
-            view.add_regions("warnings", warning_regions_by_view_id.get(view.id(), []), "comment", "dot", sublime.DRAW_OUTLINED)
+        for view in changed_views:
+            prepared = prepared_regions.get(view.id(), {})
+            view.add_regions("errors", prepared.get("errors") or regions_by_view_id_and_key.get((view.id(), "errors"), []), "invalid", "dot", sublime.DRAW_OUTLINED)
+            view.add_regions("warnings", prepared.get("warnings") or regions_by_view_id_and_key.get((view.id(), "warnings"), []), "comment", "dot", sublime.DRAW_OUTLINED)
+
+
+class ErrorReport:
+    """
+    A ResponseGetSourceErrors parsed and formatted for display, built on the
+    worker thread along with its regions (see Win.prepare_error_regions), which
+    only read from views. It is shown on the main thread.
+    """
+
+    def __init__(self, source_errors):
+        self.errors = list(parse_source_errors(source_errors))
+        # TODO: we should pass the errorKind too if the error has no span
+        self.panel_text = "\n\n".join(repr(error) for error in self.errors)
+        self.file_errors = [error for error in self.errors if error.span]
+        self.regions = {} # Map from view id to a map from region key to regions, see Win.prepare_error_regions
+
+
+def region_key(error):
+    return "warnings" if error.kind == 'KindWarning' else "errors"
+
+
+def error_signature(error):
+    """
+    What we need to know about an error to tell whether its highlight changed
+    """
+    span = error.span
+    return (error.kind, span.fromLine, span.fromColumn, span.toLine, span.toColumn)
@@ -3,7 +3,15 @@ try:
 except ImportError:
     from test.stubs import sublime_plugin
 
+try:
+    import sublime
+except ImportError:
+    from test.stubs import sublime
+
 from stack_ide_manager import StackIDEManager
+from metrics import Metrics
+from symbol_search import SymbolMatcher
+from utility import first_folder, show_definitions
 
 
 class SendStackIdeRequestCommand(sublime_plugin.WindowCommand):
@@ -26,3 +34,68 @@ class SendStackIdeRequestCommand(sublime_plugin.WindowCommand):
         if instance:
             instance.send_request(request)
 
+
+
+class ShowStackIdeLatencyCommand(sublime_plugin.WindowCommand):
+    """
+    A show_stack_ide_latency command that shows, in an output panel,
+    percentiles of how long each kind of request took to be answered.
+    """
+
+    def run(self):
+        report = Metrics.report()
+        instance = StackIDEManager.for_window(self.window)
+        if instance:
+            report += "\n\nAwaiting responses: {} (at most {} so far)".format(len(instance.conts), instance.max_pending)
+
+        panel = self.window.create_output_panel("stack_ide_latency")
+        panel.run_command("append", {"characters": report + "\n"})
+        self.window.run_command("show_panel", {"panel": "output.stack_ide_latency"})
+
+
+class GotoHsSymbolCommand(sublime_plugin.WindowCommand):
+    """
+    A goto_hs_symbol command that searches the names defined in the project,
+    as known to its symbol index, while the query is typed, showing the best
+    matches in the status bar, and then offers the ranked matches in a quick
+    panel to go to the definition of the chosen one.
+
+    Quick panels can't be given new items as their filter is typed, and
+    would filter our matches again by their own rules, hence the input panel.
+    """
+
+    # Best matches shown in the status bar while the query is typed
+    status_results = 5
+
+    def run(self):
+        self.folder = first_folder(self.window)
+        if not self.folder:
+            return
+        # Starts building the matcher, if need be, while the query is typed
+        SymbolMatcher.for_project(self.folder)
+        self.window.show_input_panel("Go to symbol:", "", self._on_done, self._on_change, None)
+
+    def _on_change(self, query):
+        matcher = SymbolMatcher.for_project(self.folder)
+        if matcher is None:
+            sublime.status_message("Indexing symbols...")
+            return
+        matches = matcher.match(query)
+        if matches:
+            best = ', '.join('{}.{}'.format(module, name)
+                             for (name, module, filepath, line, column) in matches[:self.status_results])
+            sublime.status_message("{}{} matches: {}".format(
+                len(matches), "+" if len(matches) >= matcher.max_results else "", best))
+        else:
+            sublime.status_message("No symbol matches {}".format(query))
+
+    def _on_done(self, query):
+        matcher = SymbolMatcher.for_project(self.folder)
+        if matcher is None:
+            sublime.status_message("Symbols are still being indexed")
+            return
+        matches = matcher.match(query)
+        if matches:
+            show_definitions(self.window, matches)
+        else:
+            sublime.status_message("No symbol matches {}".format(query))